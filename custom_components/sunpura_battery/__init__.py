@@ -3,23 +3,57 @@
 from __future__ import annotations
 
 import logging
+import time
 
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, SupportsResponse
 from homeassistant.const import Platform
-from .hub import MyIntegrationHub
-from .const import DOMAIN, BASE_URL  # pylint:disable=unused-import
+from homeassistant.exceptions import HomeAssistantError
+from .battery_config import DEFAULT_CHARGING_SOC, DEFAULT_DISCHARGING_SOC, GUARDIAN_MODE
+from .hub import MyIntegrationHub, async_remove_session_cookies
+from .scheduler import adaptive_interval_from_options, tier_intervals_from_options
+from .const import (  # pylint:disable=unused-import
+    DOMAIN,
+    BASE_URL,
+    CONF_COMMAND_DEBOUNCE,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_MIN_WRITE_INTERVAL,
+    DEFAULT_COMMAND_DEBOUNCE,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MIN_WRITE_INTERVAL,
+)
 
 PLATFORMS = [Platform.SENSOR, Platform.SWITCH, Platform.NUMBER, Platform.SELECT]
 
+SCHEDULE_RANGE_SCHEMA = vol.Schema({
+    vol.Required("start"): cv.time,
+    vol.Required("end"): cv.time,
+    vol.Required("power"): vol.All(vol.Coerce(int), vol.Range(min=-2400, max=2400)),
+    vol.Optional("mode", default=GUARDIAN_MODE): vol.All(vol.Coerce(int), vol.Range(min=0, max=6)),
+    vol.Optional("charging_soc", default=DEFAULT_CHARGING_SOC): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+    vol.Optional("discharging_soc", default=DEFAULT_DISCHARGING_SOC): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+})
+SET_SCHEDULE_SCHEMA = vol.Schema({
+    vol.Optional("device_sn"): cv.string,
+    vol.Required("slots"): vol.All(cv.ensure_list, [SCHEDULE_RANGE_SCHEMA]),
+})
+
+BULK_SWITCH_SCHEMA = vol.Schema({
+    vol.Required("devices"): vol.All(cv.ensure_list, [vol.Schema({
+        vol.Required("device_sn"): cv.string,
+        vol.Required("state"): cv.boolean,
+    })]),
+})
+
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(hass, entry):
         """Set up the sensor platform from a config entry."""
+        hub = None
         try:
             _LOGGER.info("Starting Sunpura Battery integration setup")
             
@@ -32,6 +66,17 @@ async def async_setup_entry(hass, entry):
                 entry.data["username"],
                 entry.data["password"],
                 entry.data["selected_device_id"],
+                max_concurrent_requests=entry.options.get(
+                    CONF_MAX_CONCURRENT_REQUESTS, DEFAULT_MAX_CONCURRENT_REQUESTS
+                ),
+                tier_intervals=tier_intervals_from_options(entry.options),
+                adaptive=adaptive_interval_from_options(entry.options),
+                min_state_write_interval=entry.options.get(
+                    CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL
+                ),
+                command_debounce=entry.options.get(
+                    CONF_COMMAND_DEBOUNCE, DEFAULT_COMMAND_DEBOUNCE
+                ),
             )
             hass.data[DOMAIN]['hub'] = hub
             hass.data[DOMAIN]['cur_plant_name']= entry.data["selected_device_name"]
@@ -43,47 +88,77 @@ async def async_setup_entry(hass, entry):
             hass.data[DOMAIN]['device_manager'] = device_manager
             
             _LOGGER.debug("Starting API calls")
-            # 获取设备数据并创建实体
-            await hub.login()
-            _LOGGER.debug("Login completed")
-            
-            await hub.getPlantVos()
-            _LOGGER.debug("getPlantVos completed")
-            
-            await hub.get_home_control_devices()
-            _LOGGER.debug("get_home_control_devices completed")
-            
-            try:
-                device_data = await hub.getHomeCountData()
-                _LOGGER.debug(f"getHomeCountData completed: {device_data is not None}")
-                
-                if device_data:
-                    _LOGGER.info(f"设备数据: {device_data}")
-                    entities = await device_manager.create_entities_from_data(device_data)
-                    _LOGGER.info(f"创建的实体: {entities}")
-                    _LOGGER.info(f"创建的设备: {device_manager.devices}")
-
-                    if entities:
-                        _LOGGER.debug("Setting up platforms")
-                        # for platform in PLATFORMS:
-                        await hass.async_create_task(
-                            hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
-                        )
-                        _LOGGER.debug("Platforms setup completed")
-                else:
-                    _LOGGER.error("Failed to get device data from API")
+            phase_start = time.monotonic()
+
+            def log_phase(phase):
+                nonlocal phase_start
+                now = time.monotonic()
+                _LOGGER.info(f"Setup phase '{phase}' took {now - phase_start:.2f}s")
+                phase_start = now
+
+            # 优先复用持久化的cookie，会话被拒绝时由请求层重新登录
+            session_restored = await hub.async_restore_session()
+
+            cached_topology = await device_manager.async_load_topology()
+            if cached_topology:
+                # 使用缓存的拓扑立即创建实体，云端数据在后台对齐
+                device_manager.create_entities_from_topology(cached_topology)
+                await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+                log_phase("cached entities")
+                entry.async_create_background_task(
+                    hass,
+                    _async_start_from_cache(hass, entry, hub, device_manager, cached_topology),
+                    f"{DOMAIN} live discovery",
+                )
+            else:
+                # 获取设备数据并创建实体
+                if not session_restored:
+                    await hub.login()
+                    _LOGGER.debug("Login completed")
+                log_phase("auth")
+
+                try:
+                    # getPlantVos 与 getHomeControlSn -> getHomeCountData 并发
+                    device_data = await hub.async_discover()
+                    _LOGGER.debug(f"getHomeCountData completed: {device_data is not None}")
+                    log_phase("discovery")
+
+                    if device_data:
+                        _LOGGER.info(f"设备数据: {device_data}")
+                        entities = await device_manager.create_entities_from_data(device_data)
+                        _LOGGER.info(f"创建的实体: {entities}")
+                        _LOGGER.info(f"创建的设备: {device_manager.devices}")
+                        log_phase("device details")
+
+                        if entities:
+                            _LOGGER.debug("Setting up platforms")
+                            # for platform in PLATFORMS:
+                            await hass.async_create_task(
+                                hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+                            )
+                            _LOGGER.debug("Platforms setup completed")
+                            log_phase("platforms")
+                    else:
+                        _LOGGER.error("Failed to get device data from API")
+                        await hub.async_close()
+                        return False
+                except Exception as e:
+                    _LOGGER.error(f"Error during device data setup: {e}", exc_info=True)
+                    await hub.async_close()
                     return False
-            except Exception as e:
-                _LOGGER.error(f"Error during device data setup: {e}", exc_info=True)
-                return False
-            
-            _LOGGER.debug("Starting polling")
-            await hub.start_polling()
-            await hub.start_schedule_login()
+
+                _LOGGER.debug("Starting polling")
+                # 首轮轮询复用启动数据，只拉取尚未获取的层（AI配置）
+                await hub.start_polling()
+                log_phase("first poll")
+            # 选项变更后重新加载以应用新的轮询间隔
+            entry.async_on_unload(entry.add_update_listener(async_reload_entry))
             
             _LOGGER.info("Sunpura Battery integration setup completed successfully")
         except Exception as e:
             _LOGGER.error(f"Fatal error during integration setup: {e}", exc_info=True)
+            if hub is not None:
+                await hub.async_close()
             return False
 
 
@@ -100,7 +175,9 @@ async def async_setup_entry(hass, entry):
             if device_sn is not None and device_sn != '':
                 hub.cur_ctl_devices=device_sn
             hass.data[DOMAIN]['cur_plant_name']=str(plant_id)
-            await hub.async_update_data()
+            # 电站已切换，所有分层缓存失效
+            hub.invalidate_tier()
+            await hub.async_request_refresh()
         # 注册电站服务
         hass.services.async_register(
             DOMAIN,
@@ -150,7 +227,7 @@ async def async_setup_entry(hass, entry):
 
         # 立即刷新主页数据
         async def refresh_data(call):
-            await hub.async_update_data()
+            await hub.async_request_refresh()
 
         hass.services.async_register(
             DOMAIN,
@@ -158,13 +235,118 @@ async def async_setup_entry(hass, entry):
             refresh_data,
         )
 
+        # 日计划：一次上传整天的充放电时段
+        async def set_schedule(call):
+            device_sn = call.data.get("device_sn")
+            if not device_sn:
+                batteries = [
+                    device.device_sn
+                    for device in hass.data[DOMAIN]['device_manager'].devices
+                    if device.icon_type == 3
+                ]
+                if not batteries:
+                    raise HomeAssistantError("No battery storage device found")
+                device_sn = batteries[0]
+            fields = await hub.async_set_schedule(device_sn, call.data["slots"])
+            return {
+                "device_sn": device_sn,
+                "slots": [
+                    {"start": vo["startTime"], "end": vo["endTime"], "power": vo["forcedPower"], "mode": vo["mode"]}
+                    for vo in fields["powerTimeSetVos"]
+                ],
+            }
+
+        hass.services.async_register(
+            DOMAIN,
+            "service_set_schedule",
+            set_schedule,
+            schema=SET_SCHEDULE_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        # 批量开关：并发下发，统一确认（如甩负荷）
+        async def bulk_switch(call):
+            switchable = {
+                entity.device.device_sn: entity.device
+                for entity in hass.data[DOMAIN]['device_manager'].entities["switch"]
+            }
+            commands = []
+            results = {}
+            for item in call.data["devices"]:
+                device = switchable.get(item["device_sn"])
+                if device is None:
+                    results[item["device_sn"]] = {"success": False, "error": "Unknown or non-switchable device"}
+                else:
+                    commands.append((device.device_sn, device.icon_type, 1 if item["state"] else 0))
+            if commands:
+                results.update(await hub.async_bulk_switch(commands))
+            return {"results": results}
+
+        hass.services.async_register(
+            DOMAIN,
+            "service_bulk_switch",
+            bulk_switch,
+            schema=BULK_SWITCH_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+
+        # 按需返回完整的电站/设备载荷（不再写入plant_name属性）
+        async def get_plant_data(call):
+            return hub.plant_payload()
+
+        hass.services.async_register(
+            DOMAIN,
+            "service_get_plant_data",
+            get_plant_data,
+            supports_response=SupportsResponse.ONLY,
+        )
+
         return True
 
 
 
+async def _async_start_from_cache(hass, entry, hub, device_manager, cached_topology):
+        """Reconcile the cached topology with live data, then start polling.
+
+        The live discovery also seeds the first poll. If devices or entity
+        keys changed, the entry is reloaded so entities match the cloud.
+        """
+        try:
+            device_data = await hub.async_discover()
+            if device_data and await device_manager.async_reconcile_topology(cached_topology, device_data):
+                _LOGGER.info("Device topology changed since last start, reloading entry")
+                hass.async_create_task(hass.config_entries.async_reload(entry.entry_id))
+                return
+        except Exception as e:
+            _LOGGER.warning(f"Live discovery failed, keeping cached topology: {e}")
+        await hub.start_polling()
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Reload the config entry when its options change."""
+        await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-        entry.async_on_unload(hass.data[DOMAIN]['hub'].stop_polling)
+        hub = hass.data[DOMAIN]['hub']
+        # 先卸载实体，会话关闭前实体与进行中的命令仍可使用hub
         unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
         if unload_ok:
-            hass.data[DOMAIN].pop(entry.entry_id)
-        return unload_ok
\ No newline at end of file
+            await hub.async_close()
+            hass.data[DOMAIN].pop(entry.entry_id, None)
+        return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Drop the persisted session cookies of a removed entry.
+
+        The cookie store is per account, so it is kept while another entry
+        still uses the same username.
+        """
+        username = entry.data["username"]
+        if any(
+            other.entry_id != entry.entry_id and other.data.get("username") == username
+            for other in hass.config_entries.async_entries(DOMAIN)
+        ):
+            return
+        await async_remove_session_cookies(hass, username)
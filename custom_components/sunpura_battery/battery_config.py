@@ -0,0 +1,315 @@
+"""Desired battery AI configuration shared by all control entities of a device."""
+
+from __future__ import annotations
+
+import copy
+import logging
+from typing import Any
+
+from homeassistant.exceptions import HomeAssistantError
+
+_LOGGER = logging.getLogger(__name__)
+
+# controlTime 槽位数量及空槽位
+CONTROL_SLOTS = 16
+EMPTY_CONTROL_TIME = "0,00:00,00:00,0,0,0,0,0,0,100,10"
+
+# setAiSystemTimesWithEnergyMode 的默认配置（未观测到云端配置时使用）
+DEFAULT_BATTERY_CONFIG: dict[str, Any] = {
+    "energyMode": 0,
+    "smartSocketMode": 0,
+    "powerSignFlag": 1,
+    "basicDisChargeEnable": 0,
+    "batBasicDisChargePower": 0,
+    "batBasicDisChargeMaxPower": 800,
+    "maxFeedPower": 2400,
+    "maxChargePower": 2400,
+    "antiRefluxSet": 0,
+    "forcedPower": 0,
+    "temporaryPower": 0,
+    "powerMode": 0,
+    "aiMode": 0,
+    "ctEnable": 1,
+    "timeMode": 0,
+    "ecVersion": "1.6",
+    "plantType": 1,
+    **{f"controlTime{i}": EMPTY_CONTROL_TIME for i in range(1, CONTROL_SLOTS + 1)},
+    "powerTimeSetVos": [],
+}
+
+
+# 时段模式：守护模式，按强制功率精确充放电
+GUARDIAN_MODE = 6
+DEFAULT_CHARGING_SOC = 100
+DEFAULT_DISCHARGING_SOC = 10
+MINUTES_PER_DAY = 24 * 60
+
+
+class ScheduleError(HomeAssistantError):
+    """A schedule plan that cannot be expressed in the battery's time slots."""
+
+
+def control_slot(start: str, end: str, power: int, mode: int = GUARDIAN_MODE,
+                 charging_soc: int = DEFAULT_CHARGING_SOC,
+                 discharging_soc: int = DEFAULT_DISCHARGING_SOC) -> tuple[str, dict]:
+    """One enabled time slot as its controlTime string and powerTimeSetVos entry.
+
+    controlTime format: enable,start,end,forcedPower,temporaryPower,mode,
+    weatherLevel,weather,energyConsume,chargingSOC,dischargingSOC
+    """
+    control_time = f"1,{start},{end},{power},0,{mode},0,0,0,{charging_soc},{discharging_soc}"
+    vo = {
+        "timeSwitch": 1,
+        "startTime": start,
+        "endTime": end,
+        "forcedPower": power,
+        "temporaryPower": 0,
+        "mode": mode,
+        "weatherLevel": 0,
+        "weather": "0",
+        "energyConsume": "0",
+        "electricPrice": "0",
+        "dischargingSOC": discharging_soc,
+        "chargingSOC": charging_soc,
+    }
+    return control_time, vo
+
+
+def _minutes(value) -> int:
+    """datetime.time 或 'HH:MM' -> 当天分钟数"""
+    if isinstance(value, str):
+        hours, _, minutes = value.partition(":")
+        return int(hours) * 60 + int(minutes)
+    return value.hour * 60 + value.minute
+
+
+def _hhmm(minutes: int) -> str:
+    minutes %= MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def compile_schedule(ranges: list[dict]) -> dict[str, Any]:
+    """Compile a day plan into controlTime1..16 and powerTimeSetVos fields.
+
+    Each range has ``start``, ``end``, ``power`` and optionally ``mode``,
+    ``charging_soc`` and ``discharging_soc``; a range ending before it
+    starts runs over midnight. Back-to-back ranges with identical settings
+    are merged into one slot. Overlapping ranges, empty ranges and plans
+    that still need more than CONTROL_SLOTS slots raise ScheduleError.
+    An empty plan clears the schedule.
+    """
+    slots = []
+    for item in sorted(ranges, key=lambda r: _minutes(r["start"])):
+        start, end = _minutes(item["start"]), _minutes(item["end"])
+        if start == end:
+            raise ScheduleError(f"Empty time range {_hhmm(start)}-{_hhmm(end)}")
+        settings = (
+            int(item["power"]),
+            int(item.get("mode", GUARDIAN_MODE)),
+            int(item.get("charging_soc", DEFAULT_CHARGING_SOC)),
+            int(item.get("discharging_soc", DEFAULT_DISCHARGING_SOC)),
+        )
+        previous = slots[-1] if slots else None
+        if previous and previous[1] == start and previous[2] == settings and previous[0] < start:
+            # 首尾相接且设置相同的时段合并为一个槽位
+            previous[1] = end
+        else:
+            slots.append([start, end, settings])
+
+    # 跨零点的时段拆成两段后检查重叠
+    spans = []
+    for start, end, _ in slots:
+        spans.extend([(start, end)] if start < end else [(start, MINUTES_PER_DAY), (0, end)])
+    spans.sort()
+    for (_, first_end), (second_start, _) in zip(spans, spans[1:]):
+        if second_start < first_end:
+            raise ScheduleError(f"Time ranges overlap at {_hhmm(second_start)}")
+
+    if len(slots) > CONTROL_SLOTS:
+        raise ScheduleError(
+            f"Plan needs {len(slots)} time slots after merging, the battery supports {CONTROL_SLOTS}"
+        )
+
+    fields: dict[str, Any] = {
+        "energyMode": 0,
+        "forcedPower": 0,
+        "timeMode": 1 if slots else 0,
+        "powerTimeSetVos": [],
+    }
+    for index in range(CONTROL_SLOTS):
+        if index < len(slots):
+            start, end, (power, mode, charging_soc, discharging_soc) = slots[index]
+            control_time, vo = control_slot(
+                _hhmm(start), _hhmm(end), power, mode, charging_soc, discharging_soc
+            )
+            fields["powerTimeSetVos"].append(vo)
+        else:
+            control_time = EMPTY_CONTROL_TIME
+        fields[f"controlTime{index + 1}"] = control_time
+    return fields
+
+
+def released_setpoint_fields() -> dict[str, Any]:
+    """Fields that clear a power setpoint: no forced power, no time slots."""
+    return {
+        "energyMode": 0,
+        "forcedPower": 0,
+        "timeMode": 0,
+        **{f"controlTime{i}": EMPTY_CONTROL_TIME for i in range(1, CONTROL_SLOTS + 1)},
+        "powerTimeSetVos": [],
+    }
+
+
+class SetpointLease:
+    """A battery power setpoint held in controlTime1 for a limited window."""
+
+    __slots__ = ("power", "start", "end", "unsub_renew")
+
+    def __init__(self, power: int, start, end):
+        self.power = power
+        self.start = start
+        self.end = end
+        self.unsub_renew = None
+
+    def fields(self) -> dict[str, Any]:
+        control_time, vo = control_slot(self.start.strftime("%H:%M"), self.end.strftime("%H:%M"), self.power)
+        return {
+            "energyMode": 0,
+            "forcedPower": self.power,
+            "timeMode": 1,
+            "controlTime1": control_time,
+            **{f"controlTime{i}": EMPTY_CONTROL_TIME for i in range(2, CONTROL_SLOTS + 1)},
+            "powerTimeSetVos": [vo],
+        }
+
+    def held_by(self, ai_config: dict | None) -> bool:
+        """Whether ``ai_config`` still runs this lease: time mode on and our slot in controlTime1."""
+        if not ai_config:
+            return False
+        control_time, _ = control_slot(self.start.strftime("%H:%M"), self.end.strftime("%H:%M"), self.power)
+        return (
+            normalize_field("timeMode", ai_config.get("timeMode")) == 1
+            and normalize_control_time(ai_config.get("controlTime1")) == normalize_control_time(control_time)
+        )
+
+
+# powerTimeSetVos 条目中参与比较的字段
+POWER_TIME_FIELDS = (
+    "timeSwitch", "startTime", "endTime", "forcedPower", "temporaryPower", "mode",
+    "weatherLevel", "weather", "energyConsume", "electricPrice", "dischargingSOC", "chargingSOC",
+)
+_EMPTY_SLOT = object()
+
+
+def _normalize_scalar(value):
+    """'100' / 100 / 100.0 -> 100, 'H:MM' -> 'HH:MM', other strings stripped."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, str):
+        value = value.strip()
+        if ":" in value:
+            hours, _, minutes = value.partition(":")
+            if hours.isdigit() and minutes.isdigit():
+                return f"{int(hours):02d}:{int(minutes):02d}"
+            return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def normalize_control_time(value):
+    """controlTime字符串规范化；未启用的槽位都视为空槽位"""
+    parts = [_normalize_scalar(part) for part in str(value or "").split(",")]
+    if not parts or parts[0] in (0, ""):
+        return _EMPTY_SLOT
+    return tuple(parts)
+
+
+def normalize_power_time_set_vos(value):
+    entries = []
+    for entry in value or []:
+        entries.append(tuple(_normalize_scalar(entry.get(field)) for field in POWER_TIME_FIELDS))
+    return tuple(sorted(entries, key=repr))
+
+
+def normalize_field(key, value):
+    """Canonical form of one configuration field, for equivalence checks."""
+    if key.startswith("controlTime"):
+        return normalize_control_time(value)
+    if key == "powerTimeSetVos":
+        return normalize_power_time_set_vos(value)
+    return _normalize_scalar(value)
+
+
+def config_matches(desired: dict[str, Any], ai_config: dict | None) -> bool:
+    """True when ``ai_config`` already holds every field of ``desired``.
+
+    Fields the cloud did not report are assumed to hold the defaults.
+    """
+    if not ai_config:
+        return False
+    for key, default in DEFAULT_BATTERY_CONFIG.items():
+        observed = ai_config.get(key)
+        if observed is None:
+            observed = default
+        if normalize_field(key, desired.get(key)) != normalize_field(key, observed):
+            return False
+    return True
+
+
+class BatteryConfig:
+    """Desired setAiSystemTimesWithEnergyMode state of one device.
+
+    The number and select entities each change only their own fields;
+    the full payload is rendered from this object when the command queue
+    sends it, so changes made within one debounce window go out as a
+    single merged upload. While no local change is pending the desired
+    state follows the configuration observed from getAiSystemByPlantId.
+    """
+
+    def __init__(self, sn):
+        self.sn = sn
+        self.desired: dict[str, Any] = copy.deepcopy(DEFAULT_BATTERY_CONFIG)
+        # 本地修改尚未上传时，不用云端观测值覆盖
+        self.pending = False
+        # 每次本地修改加一，用于判断上传完成时是否又有新修改
+        self.version = 0
+
+    def observe(self, ai_config: dict | None):
+        """Seed the desired state from the cloud's current AI configuration."""
+        if not ai_config or self.pending:
+            return
+        for key in DEFAULT_BATTERY_CONFIG:
+            if ai_config.get(key) is not None:
+                self.desired[key] = copy.deepcopy(ai_config[key])
+
+    def update(self, **fields):
+        """Change only the given fields of the desired state."""
+        _LOGGER.debug(f"电池配置变更 {self.sn}: {fields}")
+        self.desired.update(fields)
+        self.pending = True
+        self.version += 1
+
+    def matches(self, ai_config: dict | None) -> bool:
+        """True when uploading the desired state would not change ``ai_config``."""
+        return config_matches(self.desired, ai_config)
+
+    def payload(self, plant_id) -> dict[str, Any]:
+        """Full upload payload for the current desired state."""
+        return {
+            "id": 0,
+            "sn": self.sn,
+            **self.desired,
+            "plantId": plant_id,
+        }
+
+    def settled(self, version):
+        """The upload of ``version`` finished (or failed); later changes stay pending.
+
+        Once settled, the next observed configuration is taken as the truth
+        again, which also drops a change the cloud rejected.
+        """
+        if version == self.version:
+            self.pending = False
@@ -0,0 +1,93 @@
+"""Per-device command queue with debouncing and last-write-wins coalescing."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+_LOGGER = logging.getLogger(__name__)
+
+# send() 的返回值：命令无需下发（设备已处于该状态）
+SKIPPED = object()
+
+
+class _Pending:
+    """Latest value queued for one (device, parameter) and everyone waiting on it."""
+
+    __slots__ = ("value", "send", "waiters")
+
+    def __init__(self, value, send, waiter):
+        self.value = value
+        self.send = send
+        self.waiters = [waiter]
+
+
+class CommandQueue:
+    """Debounce, coalesce and serialize commands per device.
+
+    Commands for the same device and parameter submitted within the
+    debounce window collapse to the latest value; every caller gets the
+    result of the send that carried it. Sends for one device run strictly
+    one after another, and values submitted while a send is in flight are
+    held back until it completes, so an older value can never land after
+    a newer one.
+    """
+
+    def __init__(self, hass, debounce: float):
+        self.hass = hass
+        self.debounce = debounce
+        self.stats = {"coalesced": 0, "sent": 0, "skipped": 0, "failed": 0}
+        self._pending: dict[str, dict[str, _Pending]] = {}
+        self._flush_tasks: dict[str, asyncio.Task] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def submit(self, sn, param, value, send: Callable[[Any], Awaitable[Any]]):
+        """Queue ``send(value)`` for (sn, param) and wait until it (or a newer value) was sent."""
+        waiter = self.hass.loop.create_future()
+        pending = self._pending.setdefault(sn, {})
+        entry = pending.get(param)
+        if entry is None:
+            pending[param] = _Pending(value, send, waiter)
+        else:
+            # 同一设备同一参数：后写覆盖先写
+            self.stats["coalesced"] += 1
+            entry.value = value
+            entry.send = send
+            entry.waiters.append(waiter)
+        if sn not in self._flush_tasks:
+            self._flush_tasks[sn] = self.hass.async_create_task(self._flush_later(sn))
+        return await waiter
+
+    async def _flush_later(self, sn):
+        if self.debounce > 0:
+            await asyncio.sleep(self.debounce)
+        async with self._locks.setdefault(sn, asyncio.Lock()):
+            # 上一批发送完成前到达的命令都合并进这一批
+            self._flush_tasks.pop(sn, None)
+            batch = self._pending.pop(sn, {})
+            for param, entry in batch.items():
+                try:
+                    result = await entry.send(entry.value)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    _LOGGER.error(f"命令发送失败 {sn}/{param}: {e}")
+                    for waiter in entry.waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                else:
+                    self.stats["skipped" if result is SKIPPED else "sent"] += 1
+                    for waiter in entry.waiters:
+                        if not waiter.done():
+                            waiter.set_result(result)
+
+    def cancel(self):
+        """Drop queued commands (unload); their callers see CancelledError."""
+        for task in self._flush_tasks.values():
+            task.cancel()
+        self._flush_tasks.clear()
+        for pending in self._pending.values():
+            for entry in pending.values():
+                for waiter in entry.waiters:
+                    waiter.cancel()
+        self._pending.clear()
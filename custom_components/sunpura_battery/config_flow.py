@@ -6,9 +6,27 @@ import hashlib
 import logging
 import voluptuous as vol
 from homeassistant import config_entries, exceptions
-
-from .const import DOMAIN, BASE_URL  # pylint:disable=unused-import
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import callback
+
+from .const import (  # pylint:disable=unused-import
+    DOMAIN,
+    BASE_URL,
+    CONF_ADAPTIVE_POLLING,
+    CONF_COMMAND_DEBOUNCE,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_MAX_INTERVAL,
+    CONF_MIN_INTERVAL,
+    CONF_MIN_WRITE_INTERVAL,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_COMMAND_DEBOUNCE,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_TIER_INTERVALS,
+    TIER_OPTIONS,
+)
+from .hub import async_create_cloud_session, async_save_session_cookies
 _LOGGER = logging.getLogger(__name__)
 
 # This is the schema that used to display the UI to the user. This simple
@@ -37,6 +55,30 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self):
         self.data = {}
         self.family = {}
+        self._session = None
+
+    @property
+    def session(self):
+        """Dedicated cloud session for this flow, so its cookies stay private."""
+        if self._session is None:
+            self._session = async_create_cloud_session(self.hass)
+        return self._session
+
+    async def _async_close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @callback
+    def async_remove(self):
+        """Close the session if the flow is abandoned."""
+        if self._session is not None:
+            self.hass.async_create_task(self._async_close_session())
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return OptionsFlowHandler(config_entry)
 
     async def async_step_user(self, user_input=None):
         errors = {}
@@ -69,12 +111,16 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 "selected_device_id": selected_device_id,
                 "selected_device_name": selected_device_name
             })
+            # 保存本次登录的cookie，首次加载时无需再次登录
+            await async_save_session_cookies(self.hass, self.data["username"], self.session.cookie_jar)
+            await self._async_close_session()
             return self.async_create_entry(title=f"Integration - {selected_device_name}", data=self.data)
 
         try:
             self.family = await self._fetch_devices()
         except Exception as err:
             _LOGGER.error(f"Device fetch error: {err}")
+            await self._async_close_session()
             return self.async_abort(reason="device_fetch_error")
 
         return self.async_show_form(
@@ -92,7 +138,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def _login(self, username: str, password: str) -> bool:
         url = f"{BASE_URL}/user/login"
-        session = async_get_clientsession(self.hass)
+        session = self.session
         headers = {'Content-Type': 'application/json'}
         req = {"email": username, "password": password, "phoneOs": 1, "phoneModel": "1.1", "appVersion": "V1.1"}
         json_data = json.dumps(req)
@@ -107,7 +153,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def _fetch_devices(self) -> dict:
         url = f"{BASE_URL}/plant/getPlantVos"
-        session = async_get_clientsession(self.hass)
+        session = self.session
 
         async with session.get(url) as resp:
             if resp.status == 200:
@@ -118,6 +164,52 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 raise Exception("Failed to fetch devices")
 
 
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Polling options: per-tier intervals, concurrency cap, adaptive mode and state writes."""
+
+    def __init__(self, config_entry):
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self._entry.options
+        schema = {
+            vol.Required(
+                option,
+                default=options.get(option, DEFAULT_TIER_INTERVALS[tier]),
+            ): vol.All(vol.Coerce(int), vol.Range(min=5, max=86400))
+            for tier, option in TIER_OPTIONS.items()
+        }
+        schema[vol.Required(
+            CONF_MAX_CONCURRENT_REQUESTS,
+            default=options.get(CONF_MAX_CONCURRENT_REQUESTS, DEFAULT_MAX_CONCURRENT_REQUESTS),
+        )] = vol.All(vol.Coerce(int), vol.Range(min=1, max=16))
+        schema[vol.Required(
+            CONF_ADAPTIVE_POLLING,
+            default=options.get(CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING),
+        )] = bool
+        schema[vol.Required(
+            CONF_MIN_INTERVAL,
+            default=options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL),
+        )] = vol.All(vol.Coerce(int), vol.Range(min=2, max=3600))
+        schema[vol.Required(
+            CONF_MAX_INTERVAL,
+            default=options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL),
+        )] = vol.All(vol.Coerce(int), vol.Range(min=2, max=3600))
+        schema[vol.Required(
+            CONF_MIN_WRITE_INTERVAL,
+            default=options.get(CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL),
+        )] = vol.All(vol.Coerce(int), vol.Range(min=0, max=3600))
+        schema[vol.Required(
+            CONF_COMMAND_DEBOUNCE,
+            default=options.get(CONF_COMMAND_DEBOUNCE, DEFAULT_COMMAND_DEBOUNCE),
+        )] = vol.All(vol.Coerce(float), vol.Range(min=0, max=30))
+
+        return self.async_show_form(step_id="init", data_schema=vol.Schema(schema))
+
+
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we cannot connect."""
 
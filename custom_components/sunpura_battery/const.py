@@ -3,4 +3,133 @@
 # This is the internal name of the integration, it should also match the directory
 # name for the integration.
 DOMAIN = "sunpura_battery"
-BASE_URL = "https://monitor.ai-ec.cloud:8443"
\ No newline at end of file
+BASE_URL = "https://monitor.ai-ec.cloud:8443"
+
+# Upper bound on cloud requests in flight during one poll cycle.
+CONF_MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+
+# Polling tiers: each endpoint group is refreshed on its own interval (seconds).
+TIER_FLOW = "flow"  # getHomeCountData
+TIER_DEVICES = "devices"  # getDeviceBySn
+TIER_AI = "ai"  # getAiSystemByPlantId
+TIER_PLANTS = "plants"  # getPlantVos + getHomeControlSn
+
+CONF_FLOW_INTERVAL = "flow_interval"
+CONF_DEVICE_INTERVAL = "device_interval"
+CONF_AI_INTERVAL = "ai_interval"
+CONF_PLANT_INTERVAL = "plant_interval"
+
+DEFAULT_TIER_INTERVALS = {
+    TIER_FLOW: 10,
+    TIER_DEVICES: 60,
+    TIER_AI: 300,
+    TIER_PLANTS: 3600,
+}
+
+TIER_OPTIONS = {
+    TIER_FLOW: CONF_FLOW_INTERVAL,
+    TIER_DEVICES: CONF_DEVICE_INTERVAL,
+    TIER_AI: CONF_AI_INTERVAL,
+    TIER_PLANTS: CONF_PLANT_INTERVAL,
+}
+
+# Adaptive polling of the flow tier: the interval shrinks while power readings
+# move and backs off while they are flat, always within [min, max].
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_MIN_INTERVAL = "adaptive_min_interval"
+CONF_MAX_INTERVAL = "adaptive_max_interval"
+DEFAULT_ADAPTIVE_POLLING = False
+DEFAULT_MIN_INTERVAL = 5
+DEFAULT_MAX_INTERVAL = 60
+ADAPTIVE_BACKOFF_FACTOR = 1.5
+# Seconds of fast polling after a command is sent.
+ADAPTIVE_COMMAND_BOOST = 60
+# Timer callbacks firing later than this (seconds) count as event loop lag.
+ADAPTIVE_LOOP_LAG_THRESHOLD = 0.5
+
+# signal -> (candidate keys in getHomeCountData / storageList[0], significant delta)
+VOLATILITY_SIGNALS = {
+    "pv": (("pvChargePower",), 50),
+    "battery": (("batPower",), 50),
+    "load": (("totalLoadPower", "homePower"), 50),
+    "soc": (("batSoc",), 1),
+}
+
+# Dedicated HTTP client for the Sunpura cloud host.
+CLOUD_CONNECTIONS_PER_HOST = 8
+CLOUD_KEEPALIVE_TIMEOUT = 75  # seconds an idle connection is kept open
+CLOUD_DNS_CACHE_TTL = 600
+CLOUD_CONNECT_TIMEOUT = 10
+CLOUD_READ_TIMEOUT = 20
+CLOUD_TOTAL_TIMEOUT = 30
+
+# Authenticated cookies are persisted per account so restarts skip the login.
+SESSION_STORE_VERSION = 1
+
+# Discovered device/entity topology, cached per plant for instant startup.
+TOPOLOGY_STORE_VERSION = 1
+
+# State write policy: a numeric state is only written when it moved by at least
+# the threshold of its device class (other states on any change), and never more
+# often than the minimum write interval.
+SIGNIFICANCE_THRESHOLDS = {
+    "power": 5,  # W
+    "battery": 0.1,  # %
+    "voltage": 0.5,  # V
+    "current": 0.05,  # A
+    "temperature": 0.1,  # °C
+    "frequency": 0.01,  # Hz
+}
+CONF_MIN_WRITE_INTERVAL = "min_state_write_interval"
+DEFAULT_MIN_WRITE_INTERVAL = 0
+# Diagnostic counters change every cycle; write them at most this often.
+DIAGNOSTIC_MIN_WRITE_INTERVAL = 300
+
+# Data source notified on every cycle (hub-level state such as diagnostics).
+SOURCE_HUB = ("hub",)
+# Data source notified as soon as a circuit breaker changes state.
+SOURCE_BREAKERS = ("breakers",)
+
+# Distinct raw "value+unit" strings kept in the parse cache.
+VALUE_PARSE_CACHE_SIZE = 2048
+
+# displayMap fields with these (canonical) units are enabled by default;
+# all other displayMap fields are registered disabled.
+CORE_DISPLAY_UNITS = ("W", "kWh", "%")
+
+# Devices reported offline (status 0 in loadList/chargerList/heatPumpList) are
+# only probed for details on an exponential backoff between these bounds.
+OFFLINE_PROBE_INITIAL = 60
+OFFLINE_PROBE_MAX = 3600
+
+# Commands for the same device and parameter sent within this window (seconds)
+# collapse to the latest value; sends per device are always serialized.
+CONF_COMMAND_DEBOUNCE = "command_debounce"
+DEFAULT_COMMAND_DEBOUNCE = 1.0
+
+# Battery power setpoints are written as a time slot of this length (seconds)
+# and extended this long before the slot ends, as long as the setpoint stands.
+SETPOINT_LEASE_DURATION = 3600
+SETPOINT_LEASE_RENEW_MARGIN = 300
+# A lease window is restarted before it would span a whole day.
+SETPOINT_LEASE_MAX_WINDOW = 23 * 3600
+
+# After a command, only the affected source is polled at this interval (seconds)
+# until the device reports the expected state or the timeout passes.
+CONFIRM_POLL_INTERVAL = 2
+CONFIRM_TIMEOUT = 30
+
+# Requests per second (and burst) allowed per cloud account, shared by all
+# config entries of that account.
+CLOUD_RATE_LIMIT = 5.0
+CLOUD_RATE_BURST = 10
+# Transport errors, timeouts and 429/5xx answers are retried this many times
+# with exponential backoff and jitter (seconds).
+CLOUD_RETRY_ATTEMPTS = 2
+CLOUD_RETRY_BASE_DELAY = 0.5
+CLOUD_RETRY_MAX_DELAY = 8
+# An endpoint failing this many requests in a row is not called for
+# CLOUD_CIRCUIT_RESET_TIMEOUT seconds, then probed with a single request.
+CLOUD_CIRCUIT_FAILURE_THRESHOLD = 5
+CLOUD_CIRCUIT_RESET_TIMEOUT = 60
@@ -1,5 +1,8 @@
 import logging
 from enum import Enum
+
+from homeassistant.util.read_only_dict import ReadOnlyDict
+
 from .entity import BaseEntity
 
 _LOGGER = logging.getLogger(__name__)
@@ -40,9 +43,21 @@ class BaseDevice(BaseEntity):
         self.switch_status = None
         self.inter_connect_status = None
         self.value = None
+        # 只读身份属性，由该设备的所有实体共享
+        self._identity = None
+
+    def identity_attributes(self, plant_id):
+        """Static identity attributes, built once per plant and shared read-only."""
+        identity = self._identity
+        if identity is None or identity["plantId"] != plant_id:
+            identity = self._identity = ReadOnlyDict({
+                "deviceSn": self.device_sn,
+                "iconType": self.icon_type,
+                "dtc": self.device_code_type,
+                "plantId": plant_id,
+            })
+        return identity
 
-
-        
     def update_device_info(self, device_info: dict):
         """更新设备基本信息"""
         _LOGGER.info(f"更新设备信息：{device_info}")
@@ -56,6 +71,7 @@ class BaseDevice(BaseEntity):
         self.device_code_type = device_info.get("deviceCodeType")
         self.switch_status = device_info.get("switchStatus")
         self.status = device_info.get("status")
+        self._identity = None
 
 
 class EnergyManager(BaseDevice):
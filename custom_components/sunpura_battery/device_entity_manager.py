@@ -4,9 +4,15 @@ from typing import  Any
 
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity import Entity
-from .sensor import AeccSensor
+from homeassistant.helpers.storage import Store
+from .sensor import AeccSensor, AeccHubStatsSensor
+from .values import parse_value
 from .switch import AeccSwitch
 from .device_manager import DeviceManager
+from .const import CORE_DISPLAY_UNITS, DOMAIN, TIER_DEVICES, TOPOLOGY_STORE_VERSION
+
+# BaseDevice.update_device_info 使用的稳定字段
+_DEVICE_FIELDS = ("deviceSn", "deviceName", "datalogSn", "type", "iconType", "deviceCodeType")
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,33 +35,42 @@ class DeviceEntityManager:
         self.dcm = DeviceManager(self.hass, self.hub)
         self.entities: dict[str, list[Entity]] = {"sensor": [], "switch": []}
         self.devices = []
+        # 最近一次拓扑发现中是否有设备详情请求失败（失败时拓扑不完整，不写入缓存）
+        self.discovery_incomplete = False
+        # 按电站缓存拓扑，重启时无需等待云端即可创建实体
+        self._topology_store = Store(hass, TOPOLOGY_STORE_VERSION, f"{DOMAIN}.topology_{hub.senceId}")
 
 
     async def create_entities_from_data(self, data: dict) -> dict[str, list[Any]]:
-        """根据API返回的数据创建设备实体"""
+        """根据API返回的数据创建设备实体，并缓存拓扑供下次启动使用"""
+        topology = await self.discover_topology(data)
+        if not self.discovery_incomplete:
+            await self.async_save_topology(topology)
+        return self.create_entities_from_topology(topology)
+
+    async def discover_topology(self, data: dict) -> dict[str, list[dict]]:
+        """根据API返回的数据发现设备拓扑（设备、displayMap键与单位），不创建实体"""
         
         _LOGGER.debug(f"植物数据键名: {list(data.keys())}")
-        entities: dict[str, list[Any]] = {"sensor": [], "switch": []}
+        topology: dict[str, list[dict]] = {"devices": [], "switches": [], "sensors": [], "stats": []}
         # 处理负载设备列表
         if 'loadList' in data and data['loadList']:
             for load in data['loadList']:
                 if load['iconType'] == 5:  # 插座类型
                     _LOGGER.debug(f"插座新建：{load}")
-                    device = self.dcm.create_device(device_info=load)
-                    self.devices.append(device)
-                    entity = AeccSwitch(self.hass, self.hub, device, "switch", device.device_sn + "_socket_switch")
-                    entities[entity.pf].append(entity)
+                    device_sn = self._add_device(topology, load)
+                    self._add_switch(topology, device_sn, "switch", device_sn + "_socket_switch")
                     #智能联动
-                    # intervention = AeccSwitch(self.hass, self.hub, device, "intervention", device.device_sn + "_socket_intervention")
+                    # intervention = AeccSwitch(self.hass, self.hub, device, "intervention", device_sn + "_socket_intervention")
                     #目前未实现 禁用
                     # intervention.disable_entity()
                     # entities[entity.pf].append(intervention)
                     # AI预约用电
-                    # ai_switch = AeccSwitch(self.hass, self.hub, device, "AI electricity reservation", device.device_sn + "_socket_ai")
+                    # ai_switch = AeccSwitch(self.hass, self.hub, device, "AI electricity reservation", device_sn + "_socket_ai")
                     # 目前未实现 禁用
                     # ai_switch.disable_entity()
                     # entities[entity.pf].append(ai_switch)
-                    entities["sensor"].append(AeccSensor(self.hub, device, "device name",   device.device_sn+"_device_name", ""))
+                    self._add_sensor(topology, device_sn, "device name",   device_sn+"_device_name", "")
                     # _LOGGER.info(f"实体类型：{entity.pf}")
                     # "设备序列号": "NKPG1DDC40",
                     #  "Device sn": "NKPG1DDC40",
@@ -66,34 +81,32 @@ class DeviceEntityManager:
                     #                 "Today electricity consumption": "0.0kWh",
                     #                 "Total power": "22.564kWh"
                     # "额定功率": "200.0W",
-                    entities["sensor"].append(AeccSensor( self.hub, device, "rate power", device.device_sn + "_socket_rate", "W",field_name="Rated power"))
+                    self._add_sensor(topology, device_sn, "rate power", device_sn + "_socket_rate", "W",field_name="Rated power")
                     # "当前电流": "0.146A",
-                    entities["sensor"].append(AeccSensor(self.hub, device, "current", device.device_sn + "_socket_cur", "A",field_name="Current value"))
+                    self._add_sensor(topology, device_sn, "current", device_sn + "_socket_cur", "A",field_name="Current value")
                     # "当前功率": "16.1W",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "power", device.device_sn + "_socket_pow", "W",field_name="Current power"))
+                    self._add_sensor(topology, device_sn, "power", device_sn + "_socket_pow", "W",field_name="Current power")
                     # "当前电压": "235.4V",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "vol", device.device_sn + "_socket_vol", "V",field_name="Current voltage"))
+                    self._add_sensor(topology, device_sn, "vol", device_sn + "_socket_vol", "V",field_name="Current voltage")
                     # "今日用电量": "0.0kWh",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "today energy", device.device_sn + "_socket_elec_day", "kWh",field_name="Today electricity consumption"))
+                    self._add_sensor(topology, device_sn, "today energy", device_sn + "_socket_elec_day", "kWh",field_name="Today electricity consumption")
                     # "总用电量": "6.206kWh"
-                    entities["sensor"].append( AeccSensor(self.hub, device, "total energy", device.device_sn + "_socket_elec_total", "kWh",field_name="Total power"))
+                    self._add_sensor(topology, device_sn, "total energy", device_sn + "_socket_elec_total", "kWh",field_name="Total power")
 
         # 处理充电桩设备列表
         if 'chargerList' in data and data['chargerList']:
             for charger in data['chargerList']:
                 if charger['iconType'] == 6:  # 充电桩类型
                     _LOGGER.debug(f"充电桩新建：{charger}")
-                    device = self.dcm.create_device(device_info=charger)
-                    self.devices.append(device)
-                    entity = AeccSwitch(self.hass, self.hub, device, "switch", device.device_sn + "_charger_switch")
-                    entities[entity.pf].append(entity)
+                    device_sn = self._add_device(topology, charger)
+                    self._add_switch(topology, device_sn, "switch", device_sn + "_charger_switch")
                     #智能联动
-                    # intervention = AeccSwitch(self.hass, self.hub, device, "intervention", device.device_sn + "_socket_intervention")
+                    # intervention = AeccSwitch(self.hass, self.hub, device, "intervention", device_sn + "_socket_intervention")
                     #目前未实现 禁用
                     # intervention.disable_entity()
                     # entities[entity.pf].append(intervention)
                     # AI预约用电
-                    # ai_switch = AeccSwitch(self.hass, self.hub, device, "AI electricity reservation", device.device_sn + "_socket_ai")
+                    # ai_switch = AeccSwitch(self.hass, self.hub, device, "AI electricity reservation", device_sn + "_socket_ai")
                     # 目前未实现 禁用
                     # "Charging Status": "Charger Plug Connected",
                     # "Charging and Discharging Voltage": "0.0V",
@@ -103,112 +116,123 @@ class DeviceEntityManager:
                     # "datalog sn": "SXDI78C594"
                     # ai_switch.disable_entity()
                     # entities[entity.pf].append(ai_switch)
-                    entities["sensor"].append(  AeccSensor(self.hub, device, "device name",  device.device_sn + "_device_name", ""))
+                    self._add_sensor(topology, device_sn, "device name",  device_sn + "_device_name", "")
                     # _LOGGER.info(f"实体类型：{entity.pf}")
                     #"充电状态": "枪已连接",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "charger status", device.device_sn + "_charger_status", "",field_name="Charging Status"))
+                    self._add_sensor(topology, device_sn, "charger status", device_sn + "_charger_status", "",field_name="Charging Status")
                     # "充放电电压": "0.0V",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "vol", device.device_sn + "_charger_vol", "V",field_name="Charging and Discharging Voltage"))
+                    self._add_sensor(topology, device_sn, "vol", device_sn + "_charger_vol", "V",field_name="Charging and Discharging Voltage")
                     # "充放电电流": "0.0A",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "current", device.device_sn + "_charger_cur", "A",field_name="Charging and Discharging Current"))
+                    self._add_sensor(topology, device_sn, "current", device_sn + "_charger_cur", "A",field_name="Charging and Discharging Current")
                     # "充放电功率": "0.0kW",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "power", device.device_sn + "_charger_pow", "kW",field_name="Charging and Discharging Power"))
+                    self._add_sensor(topology, device_sn, "power", device_sn + "_charger_pow", "kW",field_name="Charging and Discharging Power")
                     # "充电枪温度": "0℃",
-                    entities["sensor"].append( AeccSensor(self.hub, device, "Temperature", device.device_sn + "_charger_temp", "℃",field_name="Charger Plug Temperature"))
+                    self._add_sensor(topology, device_sn, "Temperature", device_sn + "_charger_temp", "℃",field_name="Charger Plug Temperature")
                     # "采集器序列号": "SXDI78C594"
-                    entities["sensor"].append( AeccSensor(self.hub, device, "charger sn", device.device_sn + "_charger_sn", "",field_name="datalog sn"))
+                    self._add_sensor(topology, device_sn, "charger sn", device_sn + "_charger_sn", "",field_name="datalog sn")
         # 处理功率控制器列表
         if 'heatPumpList' in data and data['heatPumpList']:
             for heat in data['heatPumpList']:
                 if heat['iconType'] == 9:  # 功率控制器
                     _LOGGER.debug(f"功率控制器新建：{heat}")
-                    device = self.dcm.create_device(device_info=heat)
-                    self.devices.append(device)
-                    entity = AeccSwitch(self.hass, self.hub, device, "switch", device.device_sn + "__switch")
-                    entities[entity.pf].append(entity)
+                    device_sn = self._add_device(topology, heat)
+                    self._add_switch(topology, device_sn, "switch", device_sn + "__switch")
         # 储能，电表，能管主控数据都在这里 数据是动态的
-        # 电表
-        if  data.get("emSn") is not None :
-            res = await self.hub.fetch_device_info(data.get("emType"), data.get("emSn"))
-
-            if res:
-                _LOGGER.debug(f"电表新建：{res}")
-                # em = self.dcm.create_device(device_info=res)
-                em = self.dcm.create_device(device_info={
-                    "deviceSn": data.get("emSn"),
-                    "deviceName": data.get("emSn"),
-                    "datalogSn": data.get("emSn"),
-                    "iconType": 7,
-                    "type":data.get("emType"),
-                    "deviceCodeType": 0,
-                    "status": 0,
-                    "switchStatus": 0,
-                })
-                self.devices.append(em)
-                _LOGGER.debug(f"电表displayMap:{res["displayMap"].items()}")
-                for k,v in res["displayMap"].items():
-                    entities["sensor"].append(AeccSensor(self.hub, em, k, em.device_sn+k, ""))
-
-        # 处理电池设备 (检查不同的可能字段名)
+        # 各设备详情互不依赖，先收集查询再并发请求
         battery_sn = data.get("batSn") or data.get("batterySn") or data.get("storageSn")
         battery_type = data.get("batType") or data.get("batteryType") or data.get("storageType")
-        
+        battery_list = [b for b in (data.get('batteryList') or []) if b.get('iconType') == 2]
+        lookups = {}
+        if data.get("emSn") is not None:
+            lookups["meter"] = (data.get("emType"), data.get("emSn"))
         if battery_sn is not None:
-            res = await self.hub.fetch_device_info(battery_type, battery_sn)
-            
-            if res:
-                _LOGGER.debug(f"电池新建：{res}")
-                battery = self.dcm.create_device(device_info={
-                    "deviceSn": battery_sn,
-                    "deviceName": battery_sn,
-                    "datalogSn": battery_sn,
-                    "iconType": 2,
-                    "type": battery_type,
-                    "deviceCodeType": 0,
-                    "status": 0,
-                    "switchStatus": 0,
-                })
-                self.devices.append(battery)
-                _LOGGER.debug(f"电池displayMap:{res["displayMap"].items()}")
-                for k, v in res["displayMap"].items():
-                    entities["sensor"].append(AeccSensor(self.hub, battery, k, battery.device_sn + k, ""))
+            lookups["battery"] = (battery_type, battery_sn)
+        for i, battery_info in enumerate(battery_list):
+            lookups[("batteryList", i)] = (battery_info.get('deviceType'), battery_info.get('datalogSn'))
+        if data.get("solarSn") is not None:
+            lookups["solar"] = (data.get("solarType"), data.get("solarSn"))
+        details = {}
+        failed = False
+        for key, res in zip(lookups, await self.hub.async_fetch_device_infos(list(lookups.values()))):
+            if isinstance(res, Exception):
+                _LOGGER.error(f"Error fetching device info for {lookups[key][1]}: {res}")
+                failed = True
+                res = None
+            details[key] = res
+        self.discovery_incomplete = failed
+
+        # 电表
+        res = details.get("meter")
+        if res:
+            _LOGGER.debug(f"电表新建：{res}")
+            # em = self.dcm.create_device(device_info=res)
+            em_sn = self._add_device(topology, {
+                "deviceSn": data.get("emSn"),
+                "deviceName": data.get("emSn"),
+                "datalogSn": data.get("emSn"),
+                "iconType": 7,
+                "type":data.get("emType"),
+                "deviceCodeType": 0,
+                "status": 0,
+                "switchStatus": 0,
+            })
+            self._seed_display_map(em_sn, res)
+            _LOGGER.debug(f"电表displayMap:{res["displayMap"].items()}")
+            self._add_display_sensors(topology, em_sn, res["displayMap"])
+
+        # 处理电池设备 (检查不同的可能字段名)
+        res = details.get("battery")
+        if res:
+            _LOGGER.debug(f"电池新建：{res}")
+            self._add_device(topology, {
+                "deviceSn": battery_sn,
+                "deviceName": battery_sn,
+                "datalogSn": battery_sn,
+                "iconType": 2,
+                "type": battery_type,
+                "deviceCodeType": 0,
+                "status": 0,
+                "switchStatus": 0,
+            })
+            self._seed_display_map(battery_sn, res)
+            _LOGGER.debug(f"电池displayMap:{res["displayMap"].items()}")
+            self._add_display_sensors(topology, battery_sn, res["displayMap"])
 
         # 处理电池设备列表 (如果存在 batteryList)
-        if 'batteryList' in data and data['batteryList']:
-            for battery_info in data['batteryList']:
-                if battery_info.get('iconType') == 2:  # 电池类型
-                    _LOGGER.debug(f"电池列表新建：{battery_info}")
-                    battery_device = self.dcm.create_device(device_info=battery_info)
-                    self.devices.append(battery_device)
-                    
-                    # 获取详细的电池信息
-                    res = await self.hub.fetch_device_info(battery_info.get('deviceType'), battery_info.get('datalogSn'))
-                    if res and res.get("displayMap"):
-                        _LOGGER.debug(f"电池列表displayMap:{res["displayMap"].items()}")
-                        for k, v in res["displayMap"].items():
-                            entities["sensor"].append(AeccSensor(self.hub, battery_device, k, battery_device.device_sn + k, ""))
-
-        if  data.get("solarSn") is not None:
-            res = await self.hub.fetch_device_info( data.get("solarType"),data.get("solarSn"))
-            if res:
-                _LOGGER.debug(f"储能新建：{res}")
-                # em = self.dcm.create_device(device_info=res)
-                bs = self.dcm.create_device(device_info={
-                    "deviceSn": data.get("solarSn"),
-                    "deviceName": data.get("solarSn"),
-                    "datalogSn": data.get("solarSn"),
-                    "iconType": 3,
-                    "type": data.get("solarType"),
-                    "deviceCodeType": 0,
-                    "status": 0,
-                    "switchStatus": 0,
-                })
-                self.devices.append(bs)
-                _LOGGER.debug(f"储能displayMap:{res["displayMap"].items()}")
-                for k, v in res["displayMap"].items():
-                    entities["sensor"].append(AeccSensor(self.hub, bs, k, bs.device_sn + k, ""))
+        for i, battery_info in enumerate(battery_list):
+            _LOGGER.debug(f"电池列表新建：{battery_info}")
+            battery_device_sn = self._add_device(topology, battery_info)
+
+            # 详细的电池信息
+            res = details.get(("batteryList", i))
+            if res and res.get("displayMap"):
+                self._seed_display_map(battery_device_sn, res)
+                _LOGGER.debug(f"电池列表displayMap:{res["displayMap"].items()}")
+                self._add_display_sensors(topology, battery_device_sn, res["displayMap"])
+
+        res = details.get("solar")
+        if res:
+            _LOGGER.debug(f"储能新建：{res}")
+            # em = self.dcm.create_device(device_info=res)
+            bs_sn = self._add_device(topology, {
+                "deviceSn": data.get("solarSn"),
+                "deviceName": data.get("solarSn"),
+                "datalogSn": data.get("solarSn"),
+                "iconType": 3,
+                "type": data.get("solarType"),
+                "deviceCodeType": 0,
+                "status": 0,
+                "switchStatus": 0,
+            })
+            self._seed_display_map(bs_sn, res)
+            _LOGGER.debug(f"储能displayMap:{res["displayMap"].items()}")
+            self._add_display_sensors(topology, bs_sn, res["displayMap"])
+
+        # 设备详情已全部获取，首轮轮询无需重复请求
+        if not failed:
+            self.hub.seed_tier(TIER_DEVICES)
         if  data.get("deviceSn") is not None:
-            master = self.dcm.create_device(device_info={
+            master_sn = self._add_device(topology, {
                         "deviceSn": data.get("deviceSn"),
                         "deviceName": data.get("deviceSn"),
                         "datalogSn": data.get("deviceSn"),
@@ -218,31 +242,143 @@ class DeviceEntityManager:
                         "status": 0,
                         "switchStatus": 0,
                     })
-            self.devices.append(master)
-            _LOGGER.error(f"创建主控entity   master：{master}")
-            entities["sensor"].append(AeccSensor(self.hub, master, "plant_name", "plant_name", ""))
-            entities["sensor"].append(AeccSensor(self.hub, master, "em_status", "emStatus", ""))
-            entities["sensor"].append(AeccSensor(self.hub, master, "em_type", "emType", ""))
-            entities["sensor"].append(AeccSensor(self.hub, master, "em_sn", "emSn", ""))
+            _LOGGER.error(f"创建主控entity   master：{master_sn}")
+            self._add_sensor(topology, master_sn, "plant_name", "plant_name", "")
+            self._add_sensor(topology, master_sn, "em_status", "emStatus", "")
+            self._add_sensor(topology, master_sn, "em_type", "emType", "")
+            self._add_sensor(topology, master_sn, "em_sn", "emSn", "")
 
             # Battery sensors (now properly mapped from storageList)
-            entities["sensor"].append(AeccSensor(self.hub, master, "soc", "batSoc", "%"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "battery_charge_power", "batChargePower", "W"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "battery_discharge_power", "batDischargePower", "W"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "pv_charge_power", "pvChargePower", "W"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "ac_charge_power", "acChargePower", "W"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "device_power", "devicePower", "W"))
+            self._add_sensor(topology, master_sn, "soc", "batSoc", "%")
+            self._add_sensor(topology, master_sn, "battery_charge_power", "batChargePower", "W")
+            self._add_sensor(topology, master_sn, "battery_discharge_power", "batDischargePower", "W")
+            self._add_sensor(topology, master_sn, "pv_charge_power", "pvChargePower", "W")
+            self._add_sensor(topology, master_sn, "ac_charge_power", "acChargePower", "W")
+            self._add_sensor(topology, master_sn, "device_power", "devicePower", "W")
             
             # Energy sensors
-            entities["sensor"].append(AeccSensor(self.hub, master, "solar_day_energy", "solarDayElec", "kWh"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "total_energy", "totalEnergy", "kWh"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "today_energy", "todayEnergy", "kWh"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "month_energy", "monthEnergy", "kWh"))
-            entities["sensor"].append(AeccSensor(self.hub, master, "year_energy", "yearEnergy", "kWh"))
+            self._add_sensor(topology, master_sn, "solar_day_energy", "solarDayElec", "kWh")
+            self._add_sensor(topology, master_sn, "total_energy", "totalEnergy", "kWh")
+            self._add_sensor(topology, master_sn, "today_energy", "todayEnergy", "kWh")
+            self._add_sensor(topology, master_sn, "month_energy", "monthEnergy", "kWh")
+            self._add_sensor(topology, master_sn, "year_energy", "yearEnergy", "kWh")
+
+            self._add_sensor(topology, master_sn, "device_sn", "deviceSn", "")
+            self._add_sensor(topology, master_sn, "system sn", "systemSn", "")
 
-            entities["sensor"].append(AeccSensor(self.hub, master, "device_sn", "deviceSn", ""))
-            entities["sensor"].append(AeccSensor(self.hub, master, "system sn", "systemSn", ""))
+            self._add_sensor(topology, master_sn, "aiSystemStatus", "aiSystemStatus", "")
 
-            entities["sensor"].append(AeccSensor(self.hub, master, "aiSystemStatus", "aiSystemStatus", ""))
+            # 诊断: 刷新合并/跳过计数
+            self._add_stats_sensor(topology, master_sn, "refresh_skipped_ticks", "refresh_stats", "skipped_ticks")
+            # 诊断: 云端连接复用计数
+            self._add_stats_sensor(topology, master_sn, "cloud_connections_reused", "connection_stats", "connections_reused")
+            # 诊断: 命令队列发送数（合并/失败数见属性）
+            self._add_stats_sensor(topology, master_sn, "commands_sent", "command_stats", "sent")
+            # 诊断: 最近一次命令从下发到确认生效的秒数（确认/超时数见属性）
+            self._add_stats_sensor(topology, master_sn, "command_apply_seconds", "confirm_stats", "last_apply_seconds")
+            # 诊断: 熔断中的云端接口数（各接口状态见属性）
+            self._add_stats_sensor(topology, master_sn, "cloud_open_circuits", "breaker_stats", "open_circuits")
+            # 诊断: 累计需等待限流令牌的请求数
+            self._add_stats_sensor(topology, master_sn, "cloud_requests_queued", "rate_limit_stats", "throttled")
+        return topology
+
+    def create_entities_from_topology(self, topology: dict[str, list[dict]]) -> dict[str, list[Any]]:
+        """根据拓扑创建设备与实体，无需访问云端"""
+        entities: dict[str, list[Any]] = {"sensor": [], "switch": []}
+        devices = {}
+        for info in topology["devices"]:
+            device = self.dcm.create_device(device_info=info)
+            if device is not None:
+                self.devices.append(device)
+                devices[device.device_sn] = device
+        for spec in topology["switches"]:
+            device = devices.get(spec["sn"])
+            if device is not None:
+                entities["switch"].append(AeccSwitch(self.hass, self.hub, device, spec["name"], spec["key"]))
+        for spec in topology["sensors"]:
+            device = devices.get(spec["sn"])
+            if device is not None:
+                entities["sensor"].append(AeccSensor(
+                    self.hub, device, spec["name"], spec["key"], spec["unit"], field_name=spec["field_name"],
+                    enabled_default=spec.get("enabled", True),
+                ))
+        for spec in topology["stats"]:
+            device = devices.get(spec["sn"])
+            if device is not None:
+                entities["sensor"].append(AeccHubStatsSensor(
+                    self.hub, device, spec["name"], spec["stats_attr"], spec["value_key"]
+                ))
         self.entities = entities
         return entities
+
+    async def async_load_topology(self) -> dict[str, list[dict]] | None:
+        """读取上次缓存的拓扑"""
+        data = await self._topology_store.async_load()
+        return data.get("topology") if data else None
+
+    async def async_save_topology(self, topology: dict[str, list[dict]]):
+        await self._topology_store.async_save({"topology": topology})
+
+    async def async_reconcile_topology(self, cached: dict[str, list[dict]], data: dict) -> bool:
+        """Compare live discovery with the cached topology.
+
+        The fresh topology is stored unless a device lookup failed. Returns
+        True when devices or entity keys changed, i.e. when the entry must be
+        reloaded to pick them up; unit or name refinements alone only update
+        the cache. An incomplete discovery never counts as a change: the
+        cached topology stays and the next start reconciles again.
+        """
+        live = await self.discover_topology(data)
+        if self.discovery_incomplete:
+            _LOGGER.warning("部分设备详情获取失败，保留缓存的拓扑")
+            return False
+        if live != cached:
+            await self.async_save_topology(live)
+        return _topology_signature(live) != _topology_signature(cached)
+
+    @staticmethod
+    def _add_device(topology, info: dict) -> str:
+        # 仅缓存稳定的设备字段，状态类字段由轮询更新
+        topology["devices"].append({k: info.get(k) for k in _DEVICE_FIELDS})
+        return info.get("deviceSn")
+
+    @staticmethod
+    def _add_switch(topology, sn, name, key):
+        topology["switches"].append({"sn": sn, "name": name, "key": key})
+
+    @staticmethod
+    def _add_sensor(topology, sn, name, key, unit=None, field_name=None, enabled=True):
+        topology["sensors"].append({
+            "sn": sn, "name": name, "key": key, "unit": unit, "field_name": field_name, "enabled": enabled,
+        })
+
+    @classmethod
+    def _add_display_sensors(cls, topology, sn, display_map):
+        """displayMap字段：功率/能量/SOC为核心传感器默认启用，其余注册为禁用"""
+        for k, v in display_map.items():
+            unit = _display_unit(v)
+            cls._add_sensor(topology, sn, k, sn + k, unit, enabled=unit in CORE_DISPLAY_UNITS)
+
+    @staticmethod
+    def _add_stats_sensor(topology, sn, name, stats_attr, value_key):
+        topology["stats"].append({"sn": sn, "name": name, "stats_attr": stats_attr, "value_key": value_key})
+
+    def _seed_display_map(self, device_sn, res):
+        """把启动时获取的displayMap写入hub快照，供首轮更新直接使用"""
+        if res.get("displayMap"):
+            self.hub.devices_info[device_sn] = res["displayMap"]
+
+
+def _display_unit(value) -> str:
+    """displayMap原始值中推断出的规范单位"""
+    return parse_value(value).unit or ""
+
+
+def _topology_signature(topology: dict[str, list[dict]]):
+    """设备与实体键集合，忽略单位等可细化的属性"""
+    return (
+        sorted((d["deviceSn"] or "", d["iconType"] or 0, str(d["type"])) for d in topology["devices"]),
+        sorted(spec["key"] for spec in topology["switches"]),
+        sorted(spec["key"] for spec in topology["sensors"]),
+        sorted(spec["name"] for spec in topology["stats"]),
+    )
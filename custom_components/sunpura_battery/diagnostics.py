@@ -0,0 +1,78 @@
+"""Diagnostics support for Sunpura Battery."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+# 账号凭据，以及可识别用户的电站ID、设备序列号和位置字段
+TO_REDACT = {
+    "username",
+    "password",
+    "email",
+    "phone",
+    "userId",
+    "userName",
+    "nickName",
+    "selected_device_id",
+    "selected_device_name",
+    "cur_plant",
+    "cur_ctl_device_sn",
+    "id",
+    "plantId",
+    "plantName",
+    "deviceSn",
+    "sn",
+    "datalogSn",
+    "datalog sn",
+    "systemSn",
+    "emSn",
+    "batSn",
+    "batterySn",
+    "storageSn",
+    "solarSn",
+    "address",
+    "city",
+    "province",
+    "country",
+    "postcode",
+    "zipCode",
+    "latitude",
+    "longitude",
+    "lat",
+    "lng",
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the full cloud payloads that the plant_name sensor only summarizes."""
+    hub = hass.data[DOMAIN]['hub']
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "summary": hub.payload_summary(),
+        "payload": async_redact_data(_anonymize_device_keys(hub.plant_payload()), TO_REDACT),
+        "refresh_stats": dict(hub.refresh_stats),
+        "connection_stats": dict(hub.connection_stats),
+        "confirm_stats": dict(hub.confirm_stats),
+        "rate_limit_stats": dict(hub.rate_limit_stats),
+        "breaker_stats": dict(hub.breaker_stats),
+    }
+
+
+def _anonymize_device_keys(payload: dict[str, Any]) -> dict[str, Any]:
+    """设备详情以序列号为键，替换为序号后再脱敏"""
+    devices = payload.get("devices") or {}
+    return {
+        **payload,
+        "devices": {f"device_{index}": info for index, info in enumerate(devices.values(), 1)},
+    }
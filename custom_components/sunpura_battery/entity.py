@@ -1,9 +1,69 @@
 import logging
+import time
+
+from .const import SIGNIFICANCE_THRESHOLDS
 
 _LOGGER = logging.getLogger(__name__)
 
+_UNSET = object()
+
+
 class BaseEntity:
     def __init__(self, hass,hub):
         self.hass = hass
         self.hub = hub
-        self.unit = None
\ No newline at end of file
+        self.unit = None
+
+
+class StateWritePolicy:
+    """状态写入策略：仅在数值显著变化或属性变化时写入，并限制最小写入间隔"""
+
+    def __init__(self, device_class=None, min_interval=0, compare_attributes=True, clock=time.monotonic):
+        self.threshold = SIGNIFICANCE_THRESHOLDS.get(device_class) if device_class else None
+        self.min_interval = min_interval
+        self.compare_attributes = compare_attributes
+        self._clock = clock
+        self._value = _UNSET
+        self._attributes = None
+        self._written_at = None
+
+    def _value_changed(self, value) -> bool:
+        last = self._value
+        if (
+            self.threshold is not None
+            and isinstance(value, (int, float))
+            and isinstance(last, (int, float))
+        ):
+            return abs(value - last) >= self.threshold
+        return value != last
+
+    def _changed(self, value, attributes) -> bool:
+        return self._value_changed(value) or (
+            self.compare_attributes and attributes != self._attributes
+        )
+
+    def should_write(self, value, attributes=None) -> bool:
+        """Whether the new state differs meaningfully from the last written one."""
+        if self._value is _UNSET:
+            return True
+        if not self._changed(value, attributes):
+            return False
+        return self._written_at is None or self._clock() - self._written_at >= self.min_interval
+
+    def held_back_for(self, value, attributes=None):
+        """Seconds until a change held back only by ``min_interval`` may be written, else None."""
+        if self._value is _UNSET or self._written_at is None:
+            return None
+        if not self._changed(value, attributes):
+            return None
+        remaining = self.min_interval - (self._clock() - self._written_at)
+        return remaining if remaining > 0 else None
+
+    def written(self, value, attributes=None):
+        self._value = value
+        self._attributes = attributes
+        self._written_at = self._clock()
+
+    def reset(self):
+        """Force the next update to be written (e.g. after re-adding the entity)."""
+        self._value = _UNSET
@@ -1,14 +1,64 @@
+import asyncio
 import hashlib
 import json
 import logging
 from datetime import timedelta, datetime
 from typing import Any
 
+import aiohttp
 from aiohttp import ContentTypeError
+from yarl import URL
 
-from .const import DOMAIN, BASE_URL
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.event import async_track_time_interval
+from .const import (
+    DOMAIN,
+    BASE_URL,
+    SOURCE_BREAKERS,
+    SOURCE_HUB,
+    CLOUD_CIRCUIT_FAILURE_THRESHOLD,
+    CLOUD_CIRCUIT_RESET_TIMEOUT,
+    CLOUD_CONNECT_TIMEOUT,
+    CLOUD_CONNECTIONS_PER_HOST,
+    CLOUD_DNS_CACHE_TTL,
+    CLOUD_KEEPALIVE_TIMEOUT,
+    CLOUD_RATE_BURST,
+    CLOUD_RATE_LIMIT,
+    CLOUD_READ_TIMEOUT,
+    CLOUD_RETRY_ATTEMPTS,
+    CLOUD_RETRY_BASE_DELAY,
+    CLOUD_RETRY_MAX_DELAY,
+    CLOUD_TOTAL_TIMEOUT,
+    CONFIRM_POLL_INTERVAL,
+    CONFIRM_TIMEOUT,
+    DEFAULT_COMMAND_DEBOUNCE,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_TIER_INTERVALS,
+    SESSION_STORE_VERSION,
+    SETPOINT_LEASE_DURATION,
+    SETPOINT_LEASE_MAX_WINDOW,
+    SETPOINT_LEASE_RENEW_MARGIN,
+    TIER_AI,
+    TIER_DEVICES,
+    TIER_FLOW,
+    TIER_PLANTS,
+)
+from .battery_config import (
+    BatteryConfig,
+    SetpointLease,
+    compile_schedule,
+    config_matches,
+    released_setpoint_fields,
+)
+from .command_queue import SKIPPED, CommandQueue
+from .ratelimit import CircuitBreaker, TokenBucket, backoff_delay
+from .snapshot import Snapshot
+from .scheduler import AdaptiveInterval, PollScheduler, ProbeBackoff
+from homeassistant.const import __version__ as HA_VERSION
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util, ssl as ssl_util
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -47,23 +97,188 @@ langs = {
         'vi': 'vi-VN'
     }
 
+
+class AuthenticationError(HomeAssistantError):
+    """Error to indicate the cloud rejected the credentials or the session."""
+
+
+class CloudRequestError(HomeAssistantError):
+    """A cloud request failed at the HTTP level."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        """Throttling and server errors are worth retrying; other statuses are not."""
+        return self.status == 429 or (self.status is not None and self.status >= 500)
+
+
+def _session_expired(resp_data) -> bool:
+    """云端返回未登录/会话过期"""
+    if not isinstance(resp_data, dict):
+        return False
+    values = resp_data.values()
+    return "请登录" in values or "Please login" in values or resp_data.get("result") == "10000"
+
+
+def account_rate_limiter(hass, username: str) -> TokenBucket:
+    """账号维度的令牌桶，同一账号的所有配置条目共用"""
+    limiters = hass.data.setdefault(DOMAIN, {}).setdefault("rate_limiters", {})
+    key = md5_hash(username)
+    if key not in limiters:
+        limiters[key] = TokenBucket(CLOUD_RATE_LIMIT, CLOUD_RATE_BURST)
+    return limiters[key]
+
+
+def _session_store(hass, username: str) -> Store:
+    """账号维度的cookie存储"""
+    return Store(hass, SESSION_STORE_VERSION, f"{DOMAIN}.session_{md5_hash(username)}")
+
+
+async def async_save_session_cookies(hass, username: str, cookie_jar) -> None:
+    """Persist the cloud cookies of an authenticated session for ``username``."""
+    cookies = {name: morsel.value for name, morsel in cookie_jar.filter_cookies(URL(BASE_URL)).items()}
+    await _session_store(hass, username).async_save({"cookies": cookies})
+
+
+async def async_remove_session_cookies(hass, username: str) -> None:
+    await _session_store(hass, username).async_remove()
+
+
+def async_create_cloud_session(hass, stats: dict | None = None) -> aiohttp.ClientSession:
+    """Create a client session dedicated to the Sunpura cloud host.
+
+    The session owns its connector (keep-alive pool, DNS cache, one shared TLS
+    context) and its cookie jar, so nothing is shared with other
+    integrations. The caller must close it. When ``stats`` is given,
+    connection reuse counters are recorded into it.
+    """
+    connector = aiohttp.TCPConnector(
+        limit_per_host=CLOUD_CONNECTIONS_PER_HOST,
+        keepalive_timeout=CLOUD_KEEPALIVE_TIMEOUT,
+        use_dns_cache=True,
+        ttl_dns_cache=CLOUD_DNS_CACHE_TTL,
+        enable_cleanup_closed=True,
+        ssl=ssl_util.get_default_context(),
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=CLOUD_TOTAL_TIMEOUT,
+        connect=CLOUD_CONNECT_TIMEOUT,
+        sock_read=CLOUD_READ_TIMEOUT,
+    )
+    trace_configs = [_connection_trace_config(stats)] if stats is not None else None
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        cookie_jar=aiohttp.CookieJar(),
+        headers={"User-Agent": f"HomeAssistant/{HA_VERSION} {DOMAIN}"},
+        trace_configs=trace_configs,
+    )
+
+
+def _connection_trace_config(stats: dict) -> aiohttp.TraceConfig:
+    """统计连接新建/复用与DNS缓存命中次数"""
+    for key in ("requests", "connections_created", "connections_reused", "dns_cache_hits", "dns_cache_misses"):
+        stats.setdefault(key, 0)
+
+    def counter(key):
+        async def _count(session, ctx, params):
+            stats[key] += 1
+        return _count
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(counter("requests"))
+    trace_config.on_connection_create_end.append(counter("connections_created"))
+    trace_config.on_connection_reuseconn.append(counter("connections_reused"))
+    trace_config.on_dns_cache_hit.append(counter("dns_cache_hits"))
+    trace_config.on_dns_cache_miss.append(counter("dns_cache_misses"))
+    return trace_config
+
+
 class MyIntegrationHub:
-    def __init__(self, hass, username, password, senceId):
+    def __init__(self, hass, username, password, senceId,
+                 max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                 tier_intervals=None,
+                 adaptive: AdaptiveInterval | None = None,
+                 min_state_write_interval=DEFAULT_MIN_WRITE_INTERVAL,
+                 command_debounce=DEFAULT_COMMAND_DEBOUNCE):
 
-        self._entities = []
+        # 数据源 -> 订阅实体 的索引，以及上一轮各数据源的取值
+        self._subscriptions: dict[tuple, set] = {}
+        self._source_values: dict[tuple, Any] = {}
+        self.snapshot = Snapshot()
+        # 每台设备的命令队列：防抖、同参数后写覆盖、串行发送
+        self.commands = CommandQueue(hass, command_debounce)
+        self.command_stats = self.commands.stats
+        # 每台设备的期望电池配置（所有控制实体共用）
+        self.battery_configs: dict[str, BatteryConfig] = {}
+        # 上次下发命令后AI配置是否已重新读取；未重新读取时不做空操作判断
+        self._ai_config_fresh = False
+        self._ai_uploads = 0
+        # 每台设备当前持有的功率设定租约
+        self._leases: dict[str, SetpointLease] = {}
+        # 命令下发后的确认轮询：待确认的开关状态、每台设备的AI配置确认任务
+        self._switch_expectations: dict[str, tuple[Any, float]] = {}
+        self._switch_confirm_task: asyncio.Task | None = None
+        self._ai_confirm_tasks: dict[str, asyncio.Task] = {}
+        self.confirm_stats = {
+            "confirmed": 0,
+            "timeouts": 0,
+            "last_apply_seconds": None,
+            "max_apply_seconds": None,
+        }
+        # 完整载荷的内容摘要及其最近一次变化时间（供plant_name精简属性使用）
+        self.payload_hash = None
+        self.payload_changed_at = None
+        # 实体状态的最小写入间隔（秒）
+        self.min_state_write_interval = min_state_write_interval
         self.senceId = senceId
         self.hass = hass
         self.devices_info: dict[str, list[Any]] = {}
         self._username = username
         self._password = password
-        self._session = async_get_clientsession(self.hass)  # 存储登录后的会话
+        # 专用会话（独立连接池与cookie），卸载时关闭
+        self.connection_stats: dict[str, int] = {}
+        self._session = async_create_cloud_session(self.hass, self.connection_stats)
         self._unsub_polling = None  # 存储定时器取消函数
-        self._unsub_login = None
+        self._cookie_store = _session_store(hass, username)
+        # 账号共用的限流器，以及按接口路径划分的熔断器
+        self.rate_limiter = account_rate_limiter(hass, username)
+        self.rate_limit_stats = self.rate_limiter.stats
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self.breaker_stats = {"open_circuits": 0, "opened": 0, "rejected": 0, "circuits": {}}
         self.total_data = {}
         self.device_data: dict[str, Any] = {}
         self.plants = []
         self.home_control_devices=[]
         self.cur_ctl_devices = None
+        # 会话过期时只允许一个登录在进行；每次登录成功代数加一
+        self._login_lock = asyncio.Lock()
+        self._session_generation = 0
+        # 最近一次AI配置，与其他层缓存一起组成实体读取的合并快照
+        self.ai_config = None
+        self.scheduler = PollScheduler(tier_intervals or DEFAULT_TIER_INTERVALS)
+        # 自适应轮询（可选）：能流层按波动调整间隔
+        self.adaptive = adaptive
+        self._next_tick_at = None
+        self._adaptive_active = False
+        # 单次轮询内并发请求上限，以及按 (type, sn) 去重的设备详情请求
+        self._request_semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self._cycle_fetches: dict[tuple[Any, str], asyncio.Task] = {}
+        # single-flight 刷新：正在运行的周期和排队的后续周期
+        self._refresh_task: asyncio.Task | None = None
+        self._followup_task: asyncio.Task | None = None
+        self.refresh_stats = {
+            "cycles": 0,
+            "skipped_ticks": 0,
+            "merged_requests": 0,
+            "last_cycle_seconds": None,
+            "skipped_device_fetches": 0,
+        }
+        # 离线设备按指数退避探测
+        self._offline_backoff = ProbeBackoff()
         try:
             language_key = hass.config.language.lower() if hasattr(hass.config, 'language') else 'en'
             self.lang = langs.get(language_key, 'en-US')
@@ -73,22 +288,51 @@ class MyIntegrationHub:
             self.lang = 'en-US'
 
     async def login(self, now=None):
-        # 重新登录 并启动轮询
         """执行登录操作"""
+        async with self._login_lock:
+            await self._async_login_locked()
+
+    async def _async_login_locked(self):
         _LOGGER.warning("开始登录")
-        await self._login(self._username, self._password)
-        # 登录成功后启动轮询
-        # await self.start_polling()
+        if not await self._login(self._username, self._password):
+            raise AuthenticationError("Login rejected by the Sunpura cloud")
+        self._session_generation += 1
+        await async_save_session_cookies(self.hass, self._username, self._session.cookie_jar)
+
+    async def async_restore_session(self) -> bool:
+        """Load persisted cookies instead of logging in.
+
+        The cookies are not checked here: the first real data request
+        validates them, and a rejected session goes through the normal
+        re-login path.
+        """
+        data = await self._cookie_store.async_load()
+        if not data or not data.get("cookies"):
+            return False
+        self._session.cookie_jar.update_cookies(data["cookies"], response_url=URL(BASE_URL))
+        _LOGGER.debug("已恢复持久化的会话cookie，跳过登录")
+        return True
+
+    async def _async_relogin(self, generation):
+        """Single-flight re-login after a request saw an expired session.
+
+        Requests that failed against the same session generation share one
+        login; whoever gets the lock after it completed just replays.
+        """
+        async with self._login_lock:
+            if generation != self._session_generation:
+                _LOGGER.debug("其他请求已完成重新登录，直接重放")
+                return
+            await self._async_login_locked()
 
     async def _login(self, username, password):
         # 实现登录逻辑
         url = BASE_URL + "/user/login"
-        self._session = async_get_clientsession(self.hass)
         headers = {'Content-Type': 'application/json'}
         hash_pwd = md5_hash(password)
         req = {"email": username, "password": hash_pwd, "phoneOs": 1, "phoneModel": "1.1", "appVersion": "V1.1"}
         json_data = json.dumps(req)
-        resp = await self.post(headers, url, json_data)
+        resp = await self._request("post", headers, url, json_data, relogin=False)
         _LOGGER.info(f"登录响应：{resp}")
         if resp['result'] == 1:
             return True
@@ -99,81 +343,482 @@ class MyIntegrationHub:
         # 先取消已有轮询（如果存在）
         await self.stop_polling()
 
-        # 设置轮询间隔（示例：每15秒）
-        update_interval = timedelta(seconds      =10)
+        if self.adaptive is not None:
+            # 能流层每个自适应节拍都到期，其余层仍按各自间隔
+            self.scheduler.set_interval(TIER_FLOW, self.adaptive.min_interval)
+            self._adaptive_active = True
+            await self.async_request_refresh()
+            if self._adaptive_active:
+                self._schedule_adaptive_tick(self.adaptive.observe(self.total_data))
+            return
+
+        # 最快一层的间隔驱动定时器，其余层在到期时才拉取
+        update_interval = timedelta(seconds=self.scheduler.base_interval)
 
         # 注册定时任务
         self._unsub_polling = async_track_time_interval(
             self.hass,
-            self.async_update_data,  # 更新数据的回调函数
+            self._async_scheduled_refresh,  # 更新数据的回调函数
             update_interval
         )
 
         # 立即执行首次更新
-        await self.async_update_data()
+        await self.async_request_refresh()
 
     async def stop_polling(self):
         """停止轮询"""
+        self._adaptive_active = False
         if self._unsub_polling:
             self._unsub_polling()
             self._unsub_polling = None
 
-    async def start_schedule_login(self):
-        """启动定时轮询"""
-        # 先取消已有轮询（如果存在）
-        await self.stop_schedule_login()
-        # 设置轮询间隔
-        update_interval = timedelta(hours=8)
-        # 注册定时任务
-        self._unsub_login = async_track_time_interval(
-            self.hass,
-            self.login,  # 更新数据的回调函数
-            update_interval
+    def _schedule_adaptive_tick(self, delay):
+        if self._unsub_polling:
+            self._unsub_polling()
+        self._next_tick_at = self.hass.loop.time() + delay
+        self._unsub_polling = async_call_later(self.hass, delay, self._async_adaptive_tick)
+        _LOGGER.debug(f"下次自适应轮询: {delay:.1f}s")
+
+    async def _async_adaptive_tick(self, now=None):
+        lag = self.hass.loop.time() - self._next_tick_at
+        self._unsub_polling = None
+        try:
+            await self._async_scheduled_refresh(now)
+        finally:
+            if self._adaptive_active:
+                self.adaptive.observe(self.total_data)
+                self._schedule_adaptive_tick(self.adaptive.report_lag(lag))
+
+    async def async_submit_command(self, sn, param, value, send):
+        """Send a device command through the per-device queue.
+
+        ``send(value)`` runs after the debounce window; a newer value for
+        the same device and parameter submitted meanwhile replaces it.
+        """
+        return await self.commands.submit(sn, param, value, send)
+
+    def battery_config(self, sn) -> BatteryConfig:
+        """The device's desired AI configuration, seeded from the last observed one."""
+        config = self.battery_configs.get(sn)
+        if config is None:
+            config = self.battery_configs[sn] = BatteryConfig(sn)
+            config.observe(self.ai_config)
+        return config
+
+    async def async_update_battery_config(self, sn, **fields):
+        """Change some fields of the device's AI configuration and upload it.
+
+        Changes from several entities within one debounce window are
+        merged into a single setAiSystemTimesWithEnergyMode upload.
+        """
+        config = self.battery_config(sn)
+        config.update(**fields)
+        return await self.async_submit_command(sn, "aiSystem", config, self._async_upload_battery_config)
+
+    async def async_set_schedule(self, sn, ranges):
+        """Compile a day plan into the device's time slots and upload it in one command."""
+        fields = compile_schedule(ranges)
+        # 日计划覆盖所有时段，功率设定租约随之失效
+        self._drop_lease(sn)
+        _LOGGER.info(f"下发日计划 {sn}: {len(fields['powerTimeSetVos'])} 个时段")
+        await self.async_update_battery_config(sn, **fields)
+        return fields
+
+    async def async_set_operation_mode(self, sn, **fields):
+        """Leave manual control for an automatic operation mode.
+
+        The power setpoint lease ends and its time slot is cleared in the
+        same upload as the mode fields, so a later renewal cannot bring
+        the setpoint back.
+        """
+        self._drop_lease(sn)
+        return await self.async_update_battery_config(sn, **{**released_setpoint_fields(), **fields})
+
+    async def async_set_power_setpoint(self, sn, power: int):
+        """Hold a battery power setpoint (+ charge / - discharge); 0 releases it.
+
+        The setpoint is written as a time slot that the hub extends shortly
+        before it ends, for as long as the setpoint stands. Re-sending the
+        value that is already held costs no upload; releasing is one upload.
+        """
+        lease = self._leases.get(sn)
+        if power == 0:
+            self._drop_lease(sn)
+            return await self.async_update_battery_config(sn, **released_setpoint_fields())
+
+        now = dt_util.now()
+        if lease is not None and lease.power == power:
+            if (lease.end - now).total_seconds() > SETPOINT_LEASE_RENEW_MARGIN:
+                _LOGGER.debug(f"功率设定 {power}W 仍在租期内，无需重新下发: {sn}")
+                return None
+            start = lease.start
+        else:
+            start = now
+        self._drop_lease(sn)
+        lease = SetpointLease(power, start, now + timedelta(seconds=SETPOINT_LEASE_DURATION))
+        self._leases[sn] = lease
+        return await self._async_write_lease(sn, lease)
+
+    async def _async_write_lease(self, sn, lease: SetpointLease):
+        try:
+            return await self.async_update_battery_config(sn, **lease.fields())
+        finally:
+            if self._leases.get(sn) is lease:
+                self._schedule_lease_renewal(sn, lease)
+
+    def _schedule_lease_renewal(self, sn, lease: SetpointLease):
+        delay = (lease.end - dt_util.now()).total_seconds() - SETPOINT_LEASE_RENEW_MARGIN
+        # 上传失败时也在到期前重试
+        delay = max(delay, 60)
+
+        @callback
+        def _renew(_now):
+            lease.unsub_renew = None
+            self.hass.async_create_task(self._async_renew_lease(sn, lease))
+
+        lease.unsub_renew = async_call_later(self.hass, delay, _renew)
+
+    async def _async_renew_lease(self, sn, lease: SetpointLease):
+        """Extend the active window (same start, later end) while the setpoint stands."""
+        if self._leases.get(sn) is not lease:
+            return
+        # 只在设定仍然有效时续租：本地待上传的修改或云端最新配置已不含本租约时段则放弃
+        config = self.battery_config(sn)
+        observed = self.ai_config if self._ai_config_fresh else None
+        if (config.pending and not lease.held_by(config.desired)) or (
+            observed and not lease.held_by(observed)
+        ):
+            _LOGGER.info(f"功率设定 {lease.power}W 已被其他配置取代，停止续租: {sn}")
+            self._drop_lease(sn)
+            return
+        now = dt_util.now()
+        lease.end = now + timedelta(seconds=SETPOINT_LEASE_DURATION)
+        if (lease.end - lease.start).total_seconds() >= SETPOINT_LEASE_MAX_WINDOW:
+            lease.start = now
+        _LOGGER.debug(f"续租功率设定 {lease.power}W 至 {lease.end:%H:%M}: {sn}")
+        try:
+            await self._async_write_lease(sn, lease)
+        except Exception as e:
+            _LOGGER.error(f"功率设定续租失败 {sn}: {e}")
+
+    def _drop_lease(self, sn):
+        lease = self._leases.pop(sn, None)
+        if lease is not None and lease.unsub_renew is not None:
+            lease.unsub_renew()
+            lease.unsub_renew = None
+
+    async def _async_upload_battery_config(self, config: BatteryConfig):
+        version = config.version
+        if self._ai_config_fresh and config.matches(self.ai_config):
+            # 设备已处于期望配置，无需上传
+            _LOGGER.debug(f"电池配置未变化，跳过上传: {config.sn}")
+            config.settled(version)
+            return SKIPPED
+        payload = config.payload(self.senceId)
+        try:
+            result = await self.set_ai_system_energy_mode(payload)
+        except Exception:
+            # 上传失败：丢弃本次修改，回到最近观测到的配置
+            config.settled(version)
+            config.observe(self.ai_config)
+            raise
+        config.settled(version)
+        self.expect_ai_config(config.sn, payload)
+        return result
+
+    def expect_switch_state(self, sn, state) -> asyncio.Task:
+        """Confirm a switch command by polling only the switch-status list.
+
+        Expectations registered while a confirmation is running join it, so
+        a burst of switch commands shares one polling loop. Returns the task
+        that finishes once every pending switch is confirmed or timed out.
+        """
+        self._switch_expectations[sn] = (state, self.hass.loop.time())
+        if self._switch_confirm_task is None or self._switch_confirm_task.done():
+            self._switch_confirm_task = self.hass.async_create_task(self._async_confirm_switches())
+        return self._switch_confirm_task
+
+    async def _async_confirm_switches(self):
+        while self._switch_expectations:
+            await asyncio.sleep(CONFIRM_POLL_INTERVAL)
+            # 只拉取能流数据（开关状态所在列表），不做整轮刷新
+            data = await self._limited(self.getHomeCountData(self.cur_ctl_devices))
+            if data:
+                self.scheduler.mark_run(TIER_FLOW)
+                self._dispatch()
+            now = self.hass.loop.time()
+            for sn, (state, sent_at) in list(self._switch_expectations.items()):
+                if data and self.snapshot.switch_status(sn) == state:
+                    del self._switch_expectations[sn]
+                    self._record_confirmation(f"开关 {sn}", now - sent_at)
+                elif now - sent_at >= CONFIRM_TIMEOUT:
+                    del self._switch_expectations[sn]
+                    self._record_confirmation_timeout(f"开关 {sn}")
+                else:
+                    continue
+                # 开关状态未变化时_dispatch不会通知实体：结束等待后按最近观测到的状态重新评估，
+                # 超时时即撤销未生效的乐观状态（即使本次拉取失败）
+                self._notify_source(("switch", sn))
+
+    def expect_ai_config(self, sn, payload):
+        """Confirm a battery upload by polling only getAiSystemByPlantId.
+
+        A newer upload for the same device supersedes the running confirmation.
+        """
+        previous = self._ai_confirm_tasks.get(sn)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        self._ai_confirm_tasks[sn] = self.hass.async_create_task(
+            self._async_confirm_ai_config(sn, payload, self.hass.loop.time())
         )
 
-    async def stop_schedule_login(self):
-        """停止轮询"""
-        if self._unsub_login:
-            self._unsub_login()
-            self._unsub_login = None
+    async def _async_confirm_ai_config(self, sn, payload, sent_at):
+        try:
+            while True:
+                await asyncio.sleep(CONFIRM_POLL_INTERVAL)
+                uploads = self._ai_uploads
+                try:
+                    ai = await self._limited(self.getAiSystemByPlantId())
+                except Exception as e:
+                    _LOGGER.warning(f"确认电池配置时读取AI配置失败: {e}")
+                    ai = None
+                # 读取期间又有上传时，这份配置可能已过期
+                if ai and uploads == self._ai_uploads:
+                    self.ai_config = ai
+                    self._ai_config_fresh = True
+                    self.scheduler.mark_run(TIER_AI)
+                    for config in self.battery_configs.values():
+                        config.observe(ai)
+                    self._dispatch()
+                    if config_matches(payload, ai):
+                        self._record_confirmation(f"电池配置 {sn}", self.hass.loop.time() - sent_at)
+                        return
+                if self.hass.loop.time() - sent_at >= CONFIRM_TIMEOUT:
+                    self._record_confirmation_timeout(f"电池配置 {sn}")
+                    return
+        finally:
+            if self._ai_confirm_tasks.get(sn) is asyncio.current_task():
+                del self._ai_confirm_tasks[sn]
+
+    def _record_confirmation(self, what, seconds):
+        seconds = round(seconds, 1)
+        stats = self.confirm_stats
+        stats["confirmed"] += 1
+        stats["last_apply_seconds"] = seconds
+        if stats["max_apply_seconds"] is None or seconds > stats["max_apply_seconds"]:
+            stats["max_apply_seconds"] = seconds
+        _LOGGER.debug(f"{what} 已生效，耗时 {seconds}s")
+
+    def _record_confirmation_timeout(self, what):
+        self.confirm_stats["timeouts"] += 1
+        _LOGGER.warning(f"{what} 在 {CONFIRM_TIMEOUT}s 内未确认生效，按设备实际状态显示")
 
-    def add_entity(self, entity):
-        """添加需要更新的实体"""
-        self._entities.append(entity)
+    def note_command(self):
+        """A command was sent: poll fast for a while so the effect shows up quickly."""
+        if self.adaptive is None:
+            return
+        self.adaptive.boost()
+        # 若下一次轮询排得比最小间隔晚，则提前
+        if (
+            self._unsub_polling is not None
+            and self._next_tick_at - self.hass.loop.time() > self.adaptive.min_interval
+        ):
+            self._schedule_adaptive_tick(self.adaptive.min_interval)
+
+    async def _async_scheduled_refresh(self, now=None):
+        """Timer tick: skipped outright while a cycle is still running."""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self.refresh_stats["skipped_ticks"] += 1
+            _LOGGER.debug(f"上一轮更新未完成，跳过本次定时刷新: {self.refresh_stats}")
+            return
+        await self.async_request_refresh()
+
+    async def async_request_refresh(self):
+        """Run a refresh cycle, coalescing with any cycle already in flight.
+
+        Callers arriving while a cycle runs all join one follow-up cycle, so
+        a burst of triggers costs at most one extra fetch.
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = self.hass.async_create_task(self._async_run_cycle())
+            await asyncio.shield(self._refresh_task)
+            return
+
+        self.refresh_stats["merged_requests"] += 1
+        if self._followup_task is None or self._followup_task.done():
+            self._followup_task = self.hass.async_create_task(
+                self._async_run_followup(self._refresh_task)
+            )
+        await asyncio.shield(self._followup_task)
+
+    async def _async_run_followup(self, running: asyncio.Task):
+        """Wait for the running cycle, then start the merged follow-up."""
+        await asyncio.wait([running])
+        self._followup_task = None
+        self._refresh_task = self.hass.async_create_task(self._async_run_cycle())
+        await self._refresh_task
+
+    async def _async_run_cycle(self):
+        start = self.hass.loop.time()
+        try:
+            await self.async_update_data()
+        finally:
+            self.refresh_stats["cycles"] += 1
+            self.refresh_stats["last_cycle_seconds"] = round(self.hass.loop.time() - start, 3)
+
+    async def async_close(self):
+        """Stop all timers and close the dedicated cloud session."""
+        await self.stop_polling()
+        self.commands.cancel()
+        if self._switch_confirm_task is not None:
+            self._switch_confirm_task.cancel()
+        for task in self._ai_confirm_tasks.values():
+            task.cancel()
+        self._switch_expectations.clear()
+        # 租约不释放：设备上的时段到期后自然失效
+        for sn in list(self._leases):
+            self._drop_lease(sn)
+        if not self._session.closed:
+            await self._session.close()
+
+    def subscribe(self, entity):
+        """Index an entity under its data sources and push the current snapshot to it."""
+        for source in entity.data_sources:
+            self._subscriptions.setdefault(source, set()).add(entity)
+        if self.snapshot:
+            self._update_entity(entity)
+
+    def unsubscribe(self, entity):
+        for source in entity.data_sources:
+            subscribers = self._subscriptions.get(source)
+            if subscribers is not None:
+                subscribers.discard(entity)
+                if not subscribers:
+                    del self._subscriptions[source]
+
+    def _dispatch(self):
+        """Notify only entities subscribed to sources that changed this cycle."""
+        # 每轮只构建一次按SN索引的快照，实体直接O(1)读取
+        self.snapshot = Snapshot(self.total_data, self.devices_info, self.ai_config)
+        values = self.snapshot.source_values()
+        previous = self._source_values
+        # 只比较有实体订阅的数据源，禁用实体的字段不参与
+        changed = {
+            source for source in self._subscriptions
+            if values.get(source) != previous.get(source)
+        }
+        self._source_values = values
+        self._update_payload_digest()
+        changed.add(SOURCE_HUB)
+
+        targets = set()
+        for source in changed:
+            targets.update(self._subscriptions.get(source, ()))
+        _LOGGER.debug(f"本轮变化的数据源: {len(changed)}，通知实体: {len(targets)}")
+        for entity in targets:
+            self._update_entity(entity)
+
+    def _notify_source(self, source):
+        """Push the current snapshot to the subscribers of one source, changed or not."""
+        for entity in list(self._subscriptions.get(source, ())):
+            self._update_entity(entity)
+
+    def plant_payload(self) -> dict[str, Any]:
+        """Full cloud payloads of the current plant, for the service response and diagnostics."""
+        return {
+            "cur_plant": self.senceId,
+            "cur_ctl_device_sn": self.cur_ctl_devices,
+            "data": self.total_data,
+            "devices": self.device_data,
+            "plants": self.plants,
+            "ai_config": self.ai_config,
+        }
+
+    def payload_summary(self) -> dict[str, Any]:
+        """Compact description of the payloads: counts, content hash and last change."""
+        return {
+            "device_count": len(self.device_data),
+            "plant_count": len(self.plants or []),
+            "data_field_count": len(self.total_data),
+            "content_hash": self.payload_hash,
+            "last_changed": self.payload_changed_at,
+        }
+
+    def _update_payload_digest(self):
+        payload = json.dumps(
+            [self.total_data, self.device_data, self.plants], sort_keys=True, default=str
+        )
+        digest = hashlib.sha1(payload.encode()).hexdigest()[:16]
+        if digest != self.payload_hash:
+            self.payload_hash = digest
+            self.payload_changed_at = dt_util.utcnow().isoformat()
+
+    def _update_entity(self, entity):
+        try:
+            entity.update_data(self.snapshot)
+        except Exception as e:
+            _LOGGER.error(f"Error updating entity data: {e}")
 
     async def async_update_data(self, now=None):
-        """执行数据更新操作"""
+        """执行数据更新操作
+
+        Only tiers that are due are fetched; the rest of the snapshot
+        (total_data, devices_info, ai_config) is served from the last cycle.
+        Due requests run as a small dependency graph: getHomeControlSn must
+        finish before getHomeCountData, everything else goes out concurrently,
+        capped by the request semaphore.
+        """
         _LOGGER.debug("开始更新数据")
         start_time = datetime.now()
+        self._cycle_fetches = {}
+        due = self.scheduler.due_tiers()
+        _LOGGER.debug(f"本轮到期的轮询层: {due}")
         try:
-            # 更新主页数据
-            await self.getPlantVos()
-            await self.get_home_control_devices()
-            new_data = await self.getHomeCountData(self.cur_ctl_devices)
-            if new_data:
-                devices_manager = self.hass.data[DOMAIN]['device_manager']
-                # 按设备sn请求设备详细数据
-                for device in devices_manager.devices:
-                    if device.type != -1:
-                        _LOGGER.debug(f"开始更新设备：{device.type},{device.device_sn}")
-                        try:
-                            res = await self.fetch_device_info(device.type, device.device_sn)
-                            _LOGGER.debug(f"获取到设备信息：{res}")
-                            if res and res.get("displayMap"):
-                                self.devices_info[device.device_sn] = res["displayMap"]
-                        except Exception as e:
-                            _LOGGER.error(f"Error fetching device info for {device.device_sn}: {e}")
-                
-                # 更新设备所有关联实体
-                # 检测更新用时 获取当前时间
-                try:
-                    ai = await self.getAiSystemByPlantId()
-                    for entity in self._entities:
-                        if hasattr(entity, 'update_data'):
-                            entity.update_data(new_data, self.devices_info, ai)
-                except Exception as e:
-                    _LOGGER.error(f"Error updating entity data: {e}")
-            else:
+            if TIER_DEVICES in due:
+                for device in self._devices_to_fetch():
+                    self._fetch_device_once(device.type, device.device_sn)
+            device_fetches = list(self._cycle_fetches.values())
+            ai_uploads = self._ai_uploads
+            plants_res, ai, new_data, *device_results = await asyncio.gather(
+                self._run_tier(TIER_PLANTS, due, self.getPlantVos()),
+                self._run_tier(TIER_AI, due, self.getAiSystemByPlantId()),
+                self._fetch_flow_data(TIER_PLANTS in due),
+                *device_fetches,
+                return_exceptions=True,
+            )
+            if isinstance(plants_res, Exception):
+                _LOGGER.error(f"Error fetching plant list: {plants_res}")
+            if isinstance(ai, Exception):
+                _LOGGER.error(f"Error fetching AI system config: {ai}")
+            elif TIER_AI in due:
+                self.ai_config = ai
+                # 拉取期间又有上传时，这份配置可能已过期
+                self._ai_config_fresh = bool(ai) and ai_uploads == self._ai_uploads
+                for config in self.battery_configs.values():
+                    config.observe(ai)
+            if isinstance(new_data, Exception):
+                _LOGGER.error(f"Error fetching home data: {new_data}")
+                new_data = None
+            elif new_data:
+                self.scheduler.mark_run(TIER_FLOW)
+
+            # 按设备sn请求设备详细数据
+            device_errors = 0
+            for (device_type, device_sn), res in zip(self._cycle_fetches, device_results):
+                if isinstance(res, Exception):
+                    device_errors += 1
+                    _LOGGER.error(f"Error fetching device info for {device_sn}: {res}")
+                    continue
+                _LOGGER.debug(f"获取到设备信息：{device_type},{device_sn},{res}")
+                if res and res.get("displayMap"):
+                    self.devices_info[device_sn] = res["displayMap"]
+            if TIER_DEVICES in due and not device_errors:
+                self.scheduler.mark_run(TIER_DEVICES)
+
+            if self.total_data:
+                # 只通知数据源发生变化的实体（合并快照）
+                self._dispatch()
+            if not new_data:
                 _LOGGER.warning("No new data received from getHomeCountData")
 
         except Exception as e:
@@ -181,6 +826,98 @@ class MyIntegrationHub:
         end_time = datetime.now()
         _LOGGER.info(f"更新数据getHomeCountData完成，耗时：{end_time - start_time}")
 
+    async def _run_tier(self, tier, due, coro):
+        """Run a single-request tier if it is due, marking it fresh on success."""
+        if tier not in due:
+            coro.close()
+            return None
+        res = await self._limited(coro)
+        self.scheduler.mark_run(tier)
+        return res
+
+    def invalidate_tier(self, tier=None):
+        """Refetch a tier (or everything) on the next cycle, e.g. after a command."""
+        self.scheduler.invalidate(tier)
+
+    async def _limited(self, coro):
+        """Await a request while holding a slot of the concurrency cap."""
+        async with self._request_semaphore:
+            return await coro
+
+    async def _fetch_flow_data(self, refresh_control_devices=True):
+        """getHomeControlSn -> getHomeCountData, the only ordered edge of the cycle.
+
+        getHomeControlSn belongs to the slow plant tier; in between, the cached
+        control device is reused.
+        """
+        if refresh_control_devices:
+            await self._limited(self.get_home_control_devices())
+        return await self._limited(self.getHomeCountData(self.cur_ctl_devices))
+
+    async def async_discover(self):
+        """Startup discovery: plant list and flow data fetched concurrently.
+
+        The responses seed the plant and flow tiers, so the first poll cycle
+        does not fetch them again.
+        """
+        plants_res, device_data = await asyncio.gather(
+            self._limited(self.getPlantVos()),
+            self._fetch_flow_data(),
+        )
+        self.scheduler.mark_run(TIER_PLANTS)
+        if device_data:
+            self.scheduler.mark_run(TIER_FLOW)
+        return device_data
+
+    async def async_fetch_device_infos(self, lookups):
+        """Fetch (type, sn) lookups concurrently; failures come back as exceptions.
+
+        Results are aligned with ``lookups``. Successful displayMaps are
+        not stored here; callers know which device SN each lookup belongs to.
+        """
+        self._cycle_fetches = {}
+        tasks = [self._fetch_device_once(device_type, device_sn) for device_type, device_sn in lookups]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _devices_to_fetch(self):
+        """本轮需要拉取详情的设备：至少有一个启用实体在用其displayMap，且在线或到了离线探测时间"""
+        watched = {source[1] for source in self._subscriptions if source[0] == "display"}
+        devices = []
+        # 只统计因无人使用或离线退避而省下的请求；type为-1的设备本就无法拉取
+        skipped = 0
+        for device in self.hass.data[DOMAIN]['device_manager'].devices:
+            sn = device.device_sn
+            if device.type == -1:
+                continue
+            if sn not in watched:
+                skipped += 1
+                continue
+            if self.snapshot.is_offline(sn):
+                if not self._offline_backoff.due(sn):
+                    skipped += 1
+                    continue
+                self._offline_backoff.probed(sn)
+            else:
+                self._offline_backoff.reset(sn)
+            devices.append(device)
+        self.refresh_stats["skipped_device_fetches"] += skipped
+        return devices
+
+    def seed_tier(self, tier):
+        """Mark a tier fresh with data obtained outside the poll cycle."""
+        self.scheduler.mark_run(tier)
+
+    def _fetch_device_once(self, device_type, device_sn):
+        """Return the cycle's shared getDeviceBySn task for (type, sn)."""
+        key = (device_type, device_sn)
+        task = self._cycle_fetches.get(key)
+        if task is None:
+            task = self.hass.async_create_task(
+                self._limited(self.fetch_device_info(device_type, device_sn))
+            )
+            self._cycle_fetches[key] = task
+        return task
+
     async def getHomeCountData(self, sn=""):
         url = BASE_URL + "/energy/getHomeCountData"
         try:
@@ -254,6 +991,7 @@ class MyIntegrationHub:
             'data': v,
         })
         _LOGGER.info(f"下发开关设置响应：{resp}")
+        self.note_command()
         res = resp['msg']
         # _LOGGER.info(res)
         return res
@@ -267,6 +1005,7 @@ class MyIntegrationHub:
             'data': v,
         })
         _LOGGER.info(f"下发开关设置响应：{resp}")
+        self.note_command()
         res = resp['msg']
         # _LOGGER.info(res)
         return res
@@ -279,10 +1018,40 @@ class MyIntegrationHub:
             "switchStatus": v
         })
         _LOGGER.info(f"下发开关设置响应：{resp}")
+        self.note_command()
         res = resp['msg']
         # _LOGGER.info(res)
         return res
 
+    async def async_switch_device(self, sn, icon_type, state):
+        """Switch one device through the endpoint matching its type."""
+        if icon_type == 5:
+            return await self.switch_socket(sn, state)
+        if icon_type == 6:
+            return await self.switch_charger(sn, state)
+        return await self.switch_product(sn, state)
+
+    async def async_bulk_switch(self, commands: list[tuple[str, Any, int]]) -> dict[str, dict]:
+        """Send (sn, icon_type, state) switch commands concurrently.
+
+        The writes share the request semaphore with the poll cycle. Every
+        accepted command joins one confirmation loop on the switch-status
+        list; the returned per-device results do not wait for it.
+        """
+        results = await asyncio.gather(
+            *(self._limited(self.async_switch_device(sn, icon_type, state)) for sn, icon_type, state in commands),
+            return_exceptions=True,
+        )
+        outcome = {}
+        for (sn, _, state), result in zip(commands, results):
+            if isinstance(result, Exception):
+                _LOGGER.error(f"批量开关失败 {sn}: {result}")
+                outcome[sn] = {"state": state, "success": False, "error": str(result)}
+            else:
+                outcome[sn] = {"state": state, "success": True, "message": result}
+                self.expect_switch_state(sn, state)
+        return outcome
+
     # 电站日统计数据
     async def get_energy_data_day(self, plant_id, sn=""):
         url = BASE_URL + "/energy/getEnergyDataDay"
@@ -353,50 +1122,91 @@ class MyIntegrationHub:
 
     # 通用POST请求
     async def post(self, headers, url, data=None, params=None):
-        # headers['Accept-Language'] =self.
-        headers["Accept-Language"] = "en-US"
-        async with self._session.post(url, headers=headers, params=params, data=data) as resp:
-            if resp.status == 200:
-                self._session.cookie_jar.update_cookies(resp.cookies)
-                try:
-                    resp_data = await resp.json()
-                except json.JSONDecodeError:
-                    resp_data = await resp.text()
-                    _LOGGER.warning(resp_data)
-                except ContentTypeError:
-                    resp_data = await resp.text()
-                    _LOGGER.warning(resp_data)
-                if "请登录" in resp_data.values() or "Please login" in resp_data.values() or resp_data.get(
-                        "result") == "10000":
-                    _LOGGER.warning("需要登录")
-                    await self.login()
-                    return None
-                return resp_data
-            else:
-                raise Exception(f"Failed to fetch data from {url}")
-
-        # 通用Get请求
+        return await self._request("post", headers, url, data, params)
 
     # 通用GET请求
     async def get(self, headers, url, data=None, params=None):
+        return await self._request("get", headers, url, data, params)
+
+    async def _request(self, method, headers, url, data=None, params=None, relogin=True):
+        """Send a request, re-logging in and replaying it once if the session expired."""
         # headers['Accept-Language'] =self.lang
-        headers['Accept-Language'] ='en-US'
-        async with self._session.get(url, headers=headers, params=params, data=data) as resp:
+        headers["Accept-Language"] = "en-US"
+        generation = self._session_generation
+        resp_data = await self._send(method, headers, url, data, params)
+        if not _session_expired(resp_data):
+            return resp_data
+        if not relogin:
+            raise AuthenticationError(f"Session rejected by {url}")
+
+        _LOGGER.warning(f"需要登录: {resp_data}")
+        await self._async_relogin(generation)
+        resp_data = await self._send(method, headers, url, data, params)
+        if _session_expired(resp_data):
+            raise AuthenticationError(f"Session rejected by {url} after re-login")
+        return resp_data
+
+    def _breaker(self, url) -> CircuitBreaker:
+        endpoint = URL(url).path
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(
+                endpoint, self.breaker_stats, CLOUD_CIRCUIT_FAILURE_THRESHOLD, CLOUD_CIRCUIT_RESET_TIMEOUT,
+                on_change=self._breaker_changed,
+            )
+        return breaker
+
+    def _breaker_changed(self):
+        # 熔断可能在两次轮询之间打开又关闭，状态变化时立即通知
+        self._notify_source(SOURCE_BREAKERS)
+
+    async def _send(self, method, headers, url, data=None, params=None):
+        """Send through the account rate limiter and the endpoint's circuit breaker.
+
+        Transport errors, timeouts and 429/5xx answers are retried with
+        exponential backoff and jitter; only when the retries are used up
+        does the failure count against the breaker.
+        """
+        breaker = self._breaker(url)
+        breaker.check()
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire()
+            try:
+                resp_data = await self._send_once(method, headers, url, data, params)
+            except (aiohttp.ClientError, asyncio.TimeoutError, CloudRequestError) as e:
+                if isinstance(e, CloudRequestError) and not e.retryable:
+                    # 云端有应答（如4xx），不算接口故障
+                    breaker.record_success()
+                    raise
+                if attempt >= CLOUD_RETRY_ATTEMPTS:
+                    breaker.record_failure()
+                    if isinstance(e, CloudRequestError):
+                        raise
+                    raise CloudRequestError(f"Failed to fetch data from {url}: {e!r}") from e
+                delay = backoff_delay(attempt, CLOUD_RETRY_BASE_DELAY, CLOUD_RETRY_MAX_DELAY)
+                attempt += 1
+                _LOGGER.debug(f"请求失败，{delay:.1f}s 后第{attempt}次重试 {url}: {e!r}")
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return resp_data
+
+    async def _send_once(self, method, headers, url, data=None, params=None):
+        async with self._session.request(method, url, headers=headers, params=params, data=data) as resp:
             if resp.status == 200:
                 self._session.cookie_jar.update_cookies(resp.cookies)
                 try:
                     resp_data = await resp.json()
                 except json.JSONDecodeError:
                     resp_data = await resp.text()
-                if "请登录" in resp_data.values() or "Please login" in resp_data.values() or resp_data.get(
-                        "result") == "10000":
-                    _LOGGER.warning("需要登录")
                     _LOGGER.warning(resp_data)
-                    await self.login()
-                    return None
+                except ContentTypeError:
+                    resp_data = await resp.text()
+                    _LOGGER.warning(resp_data)
                 return resp_data
             else:
-                raise Exception(f"Failed to fetch data from {url}")
+                raise CloudRequestError(f"Failed to fetch data from {url}: HTTP {resp.status}", resp.status)
 
     # Battery Control API Methods
     async def set_ai_system_energy_mode(self, payload: dict):
@@ -418,6 +1228,11 @@ class MyIntegrationHub:
             result = await self.post(headers, url, data=json_data)
             if result and result.get("result") == 0:
                 _LOGGER.info(f"Successfully set AI system energy mode")
+                # AI配置已变更，下一轮重新拉取
+                self._ai_config_fresh = False
+                self._ai_uploads += 1
+                self.invalidate_tier(TIER_AI)
+                self.note_command()
                 return result
             elif result:
                 _LOGGER.error(f"Failed to set AI system energy mode: {result.get('msg', 'Unknown error')}")
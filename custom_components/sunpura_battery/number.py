@@ -1,7 +1,6 @@
 """Number entities for Sunpura battery control."""
 import asyncio
 import logging
-from datetime import datetime, timedelta
 from typing import Any
 
 from homeassistant.components.number import NumberEntity, NumberDeviceClass
@@ -60,70 +59,10 @@ class SunpuraBatteryPowerNumber(NumberEntity):
         """Set battery power via API - simplified for EMHASS control."""
         _LOGGER.info(f"Setting battery power to {power}W (+ = charge, - = discharge)")
         
-        # Simplified logic: always preserve solar export regardless of battery action
-        if power == 0:
-            # No battery action - pure intelligent mode
-            energy_mode = 0  # Manual mode
-            time_mode = 0    # No time scheduling
-            control_time = "0,00:00,00:00,0,0,0,0,0,0,100,10"
-            power_time_set_vos = []
-            forced_power = 0
-        else:
-            # Battery action requested - use time scheduling for precise control
-            energy_mode = 0  # Manual mode (not AI) for predictable behavior
-            time_mode = 1    # Enable time scheduling
-            
-            now = datetime.now()
-            start_time = now.strftime("%H:%M")
-            end_time = (now + timedelta(hours=1)).strftime("%H:%M")
-            
-            control_time = f"1,{start_time},{end_time},{power},0,6,0,0,0,100,10"
-            power_time_set_vos = [
-                {
-                    "timeSwitch": 1,
-                    "startTime": start_time,
-                    "endTime": end_time,
-                    "forcedPower": power,
-                    "temporaryPower": 0,
-                    "mode": 6,  # Guardian mode for precise control
-                    "weatherLevel": 0,
-                    "weather": "0",
-                    "energyConsume": "0",
-                    "electricPrice": "0",
-                    "dischargingSOC": 10,  # Stop discharge at 10%
-                    "chargingSOC": 100     # Charge to 100%
-                }
-            ]
-            forced_power = power
-
-        # Fixed parameters to ensure solar always exports to grid
-        payload = {
-            "id": 0,
-            "sn": self.device.device_sn,
-            "energyMode": energy_mode,
-            "smartSocketMode": 0,
-            "powerSignFlag": 1,
-            "basicDisChargeEnable": 0,
-            "batBasicDisChargePower": 0,
-            "batBasicDisChargeMaxPower": 800,
-            "maxFeedPower": 2400,        # Always allow full solar export
-            "maxChargePower": 2400,
-            "antiRefluxSet": 0,          # Always allow grid export
-            "forcedPower": forced_power,
-            "temporaryPower": 0,
-            "powerMode": 0,              # Always intelligent mode
-            "aiMode": 0,                 # No AI interference
-            "ctEnable": 1,               # Enable CT for accurate measurement
-            "timeMode": time_mode,
-            "ecVersion": "1.6",
-            "plantId": self.hub.senceId,
-            "plantType": 1,
-            "controlTime1": control_time,
-            **{f"controlTime{i}": "0,00:00,00:00,0,0,0,0,0,0,100,10" for i in range(2, 17)},
-            "powerTimeSetVos": power_time_set_vos
-        }
-
-        await self.hub.set_ai_system_energy_mode(payload)
+        # The hub holds the setpoint as a renewable one-hour time slot (guardian
+        # mode, charge to 100%, stop discharge at 10%); 0 releases it. Grid export
+        # settings (max feed power, anti-reflux) belong to the other controls.
+        await self.hub.async_set_power_setpoint(self.device.device_sn, power)
 
 
 class SunpuraMaxFeedPowerNumber(NumberEntity):
@@ -170,32 +109,8 @@ class SunpuraMaxFeedPowerNumber(NumberEntity):
         """Set maximum grid feed power via API."""
         _LOGGER.info(f"Setting max grid feed power to {max_power}W")
         
-        payload = {
-            "id": 0,
-            "sn": self.device.device_sn,
-            "energyMode": 0,  # Manual mode for simple parameter change
-            "smartSocketMode": 0,
-            "powerSignFlag": 1,
-            "basicDisChargeEnable": 0,
-            "batBasicDisChargePower": 0,
-            "batBasicDisChargeMaxPower": 800,
-            "maxFeedPower": max_power,    # The parameter we're changing
-            "maxChargePower": 2400,
-            "antiRefluxSet": 0,           # Always allow export
-            "forcedPower": 0,
-            "temporaryPower": 0,
-            "powerMode": 0,               # Intelligent mode
-            "aiMode": 0,
-            "ctEnable": 1,
-            "timeMode": 0,
-            "ecVersion": "1.6",
-            "plantId": self.hub.senceId,
-            "plantType": 1,
-            **{f"controlTime{i}": "0,00:00,00:00,0,0,0,0,0,0,100,10" for i in range(1, 17)},
-            "powerTimeSetVos": []
-        }
-
-        await self.hub.set_ai_system_energy_mode(payload)
+        # 只修改最大馈网功率，模式与时段保持不变
+        await self.hub.async_update_battery_config(self.device.device_sn, maxFeedPower=max_power)
 
 
 class SunpuraDischargeSOCNumber(NumberEntity):
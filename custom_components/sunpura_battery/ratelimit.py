@@ -0,0 +1,129 @@
+"""Client-side protection of the cloud API: rate limiting, circuit breaking, backoff."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Callable
+
+from homeassistant.exceptions import HomeAssistantError
+
+_LOGGER = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(HomeAssistantError):
+    """A request was rejected locally because the endpoint's circuit is open."""
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(maximum, base * 2**attempt)]."""
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token bucket limiting the request rate of one cloud account.
+
+    ``rate`` tokens per second are added up to ``burst``; each request
+    takes one. Waiters are served in arrival order. ``stats`` counts the
+    requests currently waiting for a token, the requests that had to wait
+    and the tokens handed out.
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+        self.stats = {"waiting": 0, "throttled": 0, "acquired": 0}
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        self.stats["waiting"] += 1
+        try:
+            # 锁保证先到先得
+            async with self._lock:
+                self._refill()
+                if self._tokens < 1:
+                    self.stats["throttled"] += 1
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    self._refill()
+                self._tokens -= 1
+                self.stats["acquired"] += 1
+        finally:
+            self.stats["waiting"] -= 1
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    requests are rejected without touching the network. Once
+    ``reset_timeout`` has passed a single probe request is let through
+    (half-open): success closes the circuit, failure opens it again. A
+    probe that never reports back is replaced after another timeout.
+    State changes are mirrored into the shared ``stats`` dict and reported
+    to ``on_change``.
+    """
+
+    def __init__(self, name: str, stats: dict, failure_threshold: int, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_change: Callable[[], None] | None = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._stats = stats
+        self._on_change = on_change
+        self._failures = 0
+        self._changed_at = clock()
+        self.state = CIRCUIT_CLOSED
+        stats.setdefault("circuits", {})[name] = self.state
+
+    def _set_state(self, state):
+        self.state = state
+        self._changed_at = self._clock()
+        circuits = self._stats["circuits"]
+        circuits[self.name] = state
+        self._stats["open_circuits"] = sum(1 for s in circuits.values() if s != CIRCUIT_CLOSED)
+        if self._on_change is not None:
+            self._on_change()
+
+    def check(self):
+        """Raise CircuitOpenError unless a request may go out now."""
+        if self.state == CIRCUIT_CLOSED:
+            return
+        if self._clock() - self._changed_at >= self.reset_timeout:
+            # 冷却结束（或上一次探测无结果）：放行一个探测请求
+            self._set_state(CIRCUIT_HALF_OPEN)
+            return
+        self._stats["rejected"] += 1
+        raise CircuitOpenError(f"Circuit open for {self.name}, request not sent")
+
+    def record_success(self):
+        self._failures = 0
+        if self.state != CIRCUIT_CLOSED:
+            _LOGGER.info(f"{self.name} 已恢复，关闭熔断")
+            self._set_state(CIRCUIT_CLOSED)
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or (
+            self.state == CIRCUIT_CLOSED and self._failures >= self.failure_threshold
+        ):
+            self._stats["opened"] += 1
+            _LOGGER.warning(
+                f"{self.name} 连续失败 {self._failures} 次，熔断 {self.reset_timeout}s"
+            )
+            self._set_state(CIRCUIT_OPEN)
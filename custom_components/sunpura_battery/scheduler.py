@@ -0,0 +1,199 @@
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+from .const import (
+    ADAPTIVE_BACKOFF_FACTOR,
+    ADAPTIVE_COMMAND_BOOST,
+    ADAPTIVE_LOOP_LAG_THRESHOLD,
+    CONF_ADAPTIVE_POLLING,
+    CONF_FLOW_INTERVAL,
+    CONF_MAX_INTERVAL,
+    CONF_MIN_INTERVAL,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_MAX_INTERVAL,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_TIER_INTERVALS,
+    OFFLINE_PROBE_INITIAL,
+    OFFLINE_PROBE_MAX,
+    TIER_FLOW,
+    TIER_OPTIONS,
+    VOLATILITY_SIGNALS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def tier_intervals_from_options(options) -> Dict[str, float]:
+    """根据配置项生成各层轮询间隔（秒）"""
+    return {
+        tier: float(options.get(TIER_OPTIONS[tier], default))
+        for tier, default in DEFAULT_TIER_INTERVALS.items()
+    }
+
+
+def adaptive_interval_from_options(options) -> Optional["AdaptiveInterval"]:
+    """自适应轮询未启用时返回 None"""
+    if not options.get(CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING):
+        return None
+    min_interval = float(options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL))
+    max_interval = float(options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL))
+    base_interval = float(options.get(CONF_FLOW_INTERVAL, DEFAULT_TIER_INTERVALS[TIER_FLOW]))
+    return AdaptiveInterval(min_interval, max(min_interval, max_interval), base_interval)
+
+
+class PollScheduler:
+    """分层轮询调度器，记录每个接口层的上次拉取时间并判断是否到期"""
+
+    def __init__(self, intervals: Dict[str, float], clock: Callable[[], float] = time.monotonic):
+        self._intervals = dict(intervals)
+        self._clock = clock
+        self._last_run: Dict[str, float] = {}
+
+    @property
+    def base_interval(self) -> float:
+        """The tick interval: the fastest tier drives the timer."""
+        return min(self._intervals.values())
+
+    def interval(self, tier: str) -> float:
+        return self._intervals[tier]
+
+    def due_tiers(self) -> Set[str]:
+        """Tiers whose interval has elapsed (or that were never fetched)."""
+        now = self._clock()
+        # 留出半个基础间隔的余量，避免定时器抖动导致整层推迟一个周期
+        slack = self.base_interval / 2
+        return {
+            tier
+            for tier, interval in self._intervals.items()
+            if tier not in self._last_run or now - self._last_run[tier] >= interval - slack
+        }
+
+    def set_interval(self, tier: str, interval: float):
+        self._intervals[tier] = interval
+
+    def mark_run(self, tier: str):
+        self._last_run[tier] = self._clock()
+
+    def invalidate(self, tier: str | None = None):
+        """Force a tier (or every tier) to be fetched on the next cycle."""
+        if tier is None:
+            self._last_run.clear()
+        else:
+            self._last_run.pop(tier, None)
+        _LOGGER.debug(f"轮询层失效: {tier or 'all'}")
+
+
+_NUMBER_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)")
+
+
+def _to_float(value) -> Optional[float]:
+    """Leading number of a flow value such as 123, "123.4" or "123.4W"."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER_RE.match(value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class AdaptiveInterval:
+    """自适应轮询间隔：功率波动或下发命令后加快，读数平稳或事件循环卡顿时放慢"""
+
+    def __init__(self, min_interval: float, max_interval: float,
+                 base_interval: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # 光伏/电池读数缺失时无法判断昼夜，回到能流层的基础间隔
+        self.base_interval = min_interval if base_interval is None else base_interval
+        self.current = min_interval
+        self._clock = clock
+        self._previous: Dict[str, float] = {}
+        self._boost_until = 0.0
+
+    @staticmethod
+    def _signals(data: Dict[str, Any]) -> Dict[str, float]:
+        storage_list = data.get("storageList") or []
+        storage = storage_list[0] if storage_list else {}
+        values = {}
+        for signal, (keys, _) in VOLATILITY_SIGNALS.items():
+            for key in keys:
+                value = _to_float(storage.get(key, data.get(key)))
+                if value is not None:
+                    values[signal] = value
+                    break
+        return values
+
+    def observe(self, data: Optional[Dict[str, Any]]) -> float:
+        """Fold the latest snapshot in and return the next interval."""
+        if not data:
+            return self.current
+        values = self._signals(data)
+        volatile = any(
+            signal in self._previous
+            and abs(value - self._previous[signal]) >= VOLATILITY_SIGNALS[signal][1]
+            for signal, value in values.items()
+        )
+        self._previous = values
+        # 夜间：无光伏且电池空闲；缺少任一读数时视为未知，不算空闲
+        known = "pv" in values and "battery" in values
+        idle = known and values["pv"] <= 0 and values["battery"] == 0
+
+        if volatile or self._clock() < self._boost_until:
+            target = self.min_interval
+        elif not known:
+            _LOGGER.debug(f"能流数据缺少光伏/电池功率字段，使用基础间隔: {sorted(values)}")
+            target = self.base_interval
+        elif idle:
+            target = self.max_interval
+        else:
+            target = self.current * ADAPTIVE_BACKOFF_FACTOR
+        self.current = self._bound(target)
+        return self.current
+
+    def boost(self):
+        """Poll at the minimum interval for a while after a command."""
+        self._boost_until = self._clock() + ADAPTIVE_COMMAND_BOOST
+        self.current = self.min_interval
+
+    def report_lag(self, lag: float) -> float:
+        """Back off when the event loop delivered our timer late."""
+        if lag > ADAPTIVE_LOOP_LAG_THRESHOLD:
+            _LOGGER.debug(f"事件循环延迟 {lag:.2f}s，放慢轮询")
+            self.current = self._bound(self.current * 2)
+        return self.current
+
+    def _bound(self, interval: float) -> float:
+        return max(self.min_interval, min(self.max_interval, interval))
+
+
+class ProbeBackoff:
+    """离线设备的探测退避：每次探测后间隔翻倍，直到设备重新上线"""
+
+    def __init__(self, initial: float = OFFLINE_PROBE_INITIAL, maximum: float = OFFLINE_PROBE_MAX,
+                 clock: Callable[[], float] = time.monotonic):
+        self.initial = initial
+        self.maximum = maximum
+        self._clock = clock
+        # key -> (当前间隔, 下次探测时间)
+        self._state: Dict[Any, tuple] = {}
+
+    def due(self, key) -> bool:
+        """A newly offline device is probed once right away, then on the backoff."""
+        state = self._state.get(key)
+        return state is None or self._clock() >= state[1]
+
+    def probed(self, key):
+        state = self._state.get(key)
+        delay = self.initial if state is None else min(state[0] * 2, self.maximum)
+        self._state[key] = (delay, self._clock() + delay)
+
+    def reset(self, key):
+        """The device is online again; drop its backoff."""
+        self._state.pop(key, None)
+
+    def __len__(self):
+        return len(self._state)
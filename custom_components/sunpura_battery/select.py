@@ -91,37 +91,20 @@ class SunpuraBatteryModeSelect(SelectEntity):
             }
         }
         
-        config = mode_configs[mode]
-        
-        payload = {
-            "id": 0,
-            "sn": self.device.device_sn,
-            "energyMode": config["energyMode"],
-            "smartSocketMode": 0,
-            "powerSignFlag": 1,
-            "basicDisChargeEnable": 0,
-            "batBasicDisChargePower": 0,
-            "batBasicDisChargeMaxPower": 800,
-            "maxFeedPower": 2400,
-            "maxChargePower": 2400,
-            "antiRefluxSet": config["antiRefluxSet"],
-            "forcedPower": config["forcedPower"],
-            "temporaryPower": 0,
-            "powerMode": config["powerMode"],
-            "aiMode": config["aiMode"],
-            "ctEnable": 1,
-            "timeMode": config["timeMode"],
-            "ecVersion": "1.6",
-            "plantId": self.hub.senceId,
-            "plantType": 1,
-            **{f"controlTime{i}": "0,00:00,00:00,0,0,0,0,0,0,100,10" for i in range(1, 17)},
-            "powerTimeSetVos": []
-        }
+        config = dict(mode_configs[mode])
+        description = config.pop("description")
         
         # Log the mode change with description
-        _LOGGER.info(f"Battery mode '{mode}': {config['description']}")
+        _LOGGER.info(f"Battery mode '{mode}': {description}")
         
-        await self.hub.set_ai_system_energy_mode(payload)
+        if mode == "manual_control":
+            # 只修改模式相关字段；时段与强制功率由功率设定（number实体）管理
+            config.pop("timeMode")
+            config.pop("forcedPower")
+            await self.hub.async_update_battery_config(self.device.device_sn, **config)
+        else:
+            # 离开手动控制：结束功率设定租约并清除其时段
+            await self.hub.async_set_operation_mode(self.device.device_sn, **config)
 
 
 class SunpuraGridModeSelect(SelectEntity):
@@ -198,36 +181,13 @@ class SunpuraGridModeSelect(SelectEntity):
             }
         }
         
-        config = mode_configs[mode]
-        
-        payload = {
-            "id": 0,
-            "sn": self.device.device_sn,
-            "energyMode": 0,  # Manual mode for grid settings
-            "smartSocketMode": 0,
-            "powerSignFlag": 1,
-            "basicDisChargeEnable": 0,
-            "batBasicDisChargePower": 0,
-            "batBasicDisChargeMaxPower": 800,
-            "maxFeedPower": config["maxFeedPower"],
-            "maxChargePower": 2400,
-            "antiRefluxSet": config["antiRefluxSet"],
-            "forcedPower": 0,
-            "temporaryPower": 0,
-            "powerMode": config["powerMode"],
-            "aiMode": 0,
-            "ctEnable": 1,
-            "timeMode": 0,
-            "ecVersion": "1.6",
-            "plantId": self.hub.senceId,
-            "plantType": 1,
-            **{f"controlTime{i}": "0,00:00,00:00,0,0,0,0,0,0,100,10" for i in range(1, 17)},
-            "powerTimeSetVos": []
-        }
+        config = dict(mode_configs[mode])
+        description = config.pop("description")
         
-        _LOGGER.info(f"Grid mode '{mode}': {config['description']}")
+        _LOGGER.info(f"Grid mode '{mode}': {description}")
         
-        await self.hub.set_ai_system_energy_mode(payload)
+        # 只修改馈网相关字段
+        await self.hub.async_update_battery_config(self.device.device_sn, **config)
 
 
 async def async_setup_entry(
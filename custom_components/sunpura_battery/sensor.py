@@ -1,39 +1,35 @@
 import asyncio
 import logging
 import re
-from datetime import datetime
 
 from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.const import MATCH_ALL, EntityCategory
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
 from .hub import MyIntegrationHub
-from .const import DOMAIN
+from .const import DOMAIN, DIAGNOSTIC_MIN_WRITE_INTERVAL, SOURCE_BREAKERS, SOURCE_HUB
+from .entity import StateWritePolicy
+from .values import canonical_unit, parse_value
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def split_value_unit(s):
-    """
-    将类似 "239kwh"、"953w" 或纯数值（如 "123"）的字符串拆分为数值和单位
-    :param s: 输入字符串
-    :return: (数值, 单位)
-    """
-    # 正则表达式匹配数值部分（整数/小数）和可选的单位部分（非数字）
-    pattern = r'^(-?\d+\.?\d*)(\D*)$'
-    match = re.fullmatch(pattern, str(s))
-
-    if not match:
-        return s, None
-
-    value = float(match.group(1))
-    unit_part = match.group(2).strip()  # 去除单位部分的前后空白
-    unit = unit_part if unit_part else ''  # 单位可能为空
-    return value, unit
+# 优先从 storageList[0] 读取的电池字段
+STORAGE_KEYS = ('batSoc', 'batChargePower', 'batDischargePower', 'pvChargePower', 'acChargePower', 'devicePower')
 
 
 class AeccSensor(SensorEntity):
     """自定义传感器实体"""
 
-    def __init__(self, hub:MyIntegrationHub, device, name, key, unit=None, field_name=None):
+    # 状态由hub推送，不需要HA定时轮询
+    _attr_should_poll = False
+    # 载荷摘要随每次云端数据变化，不写入记录器
+    _unrecorded_attributes = frozenset({"content_hash", "last_changed", "data_field_count"})
+
+    def __init__(self, hub:MyIntegrationHub, device, name, key, unit=None, field_name=None, enabled_default=True):
         super().__init__()
+        # 非核心的displayMap字段默认禁用，禁用的实体不会订阅hub更新
+        self._attr_entity_registry_enabled_default = enabled_default
         self.device = device
         self.hub = hub
         self.pf = "sensor"
@@ -41,25 +37,93 @@ class AeccSensor(SensorEntity):
         self.field_name = field_name
         self._name = name
         self._unique_id = self._generate_unique_id()
-        self._unit = unit
+        # 声明的单位统一为规范单位（kW→W, Wh→kWh, ℃→°C），无单位的原始值按其系数换算
+        self._unit, self._unit_scale = canonical_unit(unit)
         self._state = None
+        # 上一次的原始值及其解码结果，原始值不变时跳过解析
+        self._last_raw = None
+        self._decoded = None
         self._device_class = self._determine_device_class()
         self._state_class = self._determine_state_class()
+        self._write_policy = StateWritePolicy(self._device_class, hub.min_state_write_interval)
+        self._unsub_deferred_write = None
         if name =='plant_name':
             _LOGGER.debug(f"创建传感器实体: name{self._name}; unique_id: {self._unique_id}")
             _LOGGER.debug(f"创建传感器实体: hub.device_data{hub.device_data}; hub.plants: {hub.plants}")
+            # 完整载荷通过 service_get_plant_data 或诊断下载获取
             self._attributes={
                 "cur_plant":hub.senceId,
                 "cur_ctl_device_sn":hub.cur_ctl_devices,
-                "data":hub.total_data,
-                "devices":hub.device_data,
-                "plants": hub.plants,
+                **hub.payload_summary(),
             }
         else:
             self._attributes = {}
+        self._data_sources = self._determine_data_sources()
         _LOGGER.debug(f"创建传感器实体: {self.device}")
-        # 注册到hub
-        hub.add_entity(self)
+
+    async def async_added_to_hass(self):
+        # 注册到hub，按数据源接收更新
+        self._write_policy.reset()
+        self.hub.subscribe(self)
+
+    async def async_will_remove_from_hass(self):
+        self.hub.unsubscribe(self)
+        if self._unsub_deferred_write is not None:
+            self._unsub_deferred_write()
+            self._unsub_deferred_write = None
+
+    def _defer_write(self):
+        """变化只因最小写入间隔被挡下时，到期后按最新快照补写（数据源不变时不会再收到通知）"""
+        delay = self._write_policy.held_back_for(self._state, self._attributes)
+        if delay is None or self._unsub_deferred_write is not None:
+            return
+        self._unsub_deferred_write = async_call_later(self.hass, delay, self._async_flush_deferred_write)
+
+    @callback
+    def _async_flush_deferred_write(self, _now):
+        self._unsub_deferred_write = None
+        self.update_data(self.hub.snapshot)
+
+    def _apply_value(self, v):
+        """解析 '数值+单位' 原始值并更新状态与单位"""
+        if v != self._last_raw or self._decoded is None:
+            self._decoded = parse_value(v)
+            self._last_raw = v
+            _LOGGER.debug(f"解析后：{self._key},{self._decoded}")
+        value, unit, _ = self._decoded
+        if unit is None:
+            # 非数值原样作为状态
+            self._state = value
+            return
+        if not unit and self._unit_scale != 1:
+            value = round(value * self._unit_scale, 6)
+        self._state = value
+
+        # Only update unit if it wasn't provided during initialization
+        if not self._unit and unit:
+            self._unit = unit
+
+    @property
+    def data_sources(self):
+        """Hub snapshot sources this sensor's state is derived from."""
+        return self._data_sources
+
+    def _determine_data_sources(self):
+        if self._key == "aiSystemStatus":
+            return frozenset({("ai",)})
+        if self._key == "plant_name":
+            return frozenset({SOURCE_HUB})
+        if self._key == "totalLoadPower":
+            return frozenset(("flow", k) for k in ("totalLoadPower", "homePower", "loadPower", "chargerTotalPower"))
+        if self._key == "batPower":
+            return frozenset({("flow", "batPower"), ("flow", "batWorkMode")})
+        sources = {
+            ("flow", self._key),
+            ("display", self.device.device_sn, self.field_name or self._name),
+        }
+        if self._key in STORAGE_KEYS:
+            sources.add(("storage", self._key))
+        return frozenset(sources)
 
 
     def _generate_unique_id(self):
@@ -163,39 +227,22 @@ class AeccSensor(SensorEntity):
             "model": self.device.icon_type,
             "manufacturer": "AECC",
         }
-    def update_data(self, new_data, device_info, ai):
-        """Update sensor data with proper error handling."""
-        if not new_data:
+    def update_data(self, snapshot):
+        """Update sensor data from the hub's per-cycle snapshot."""
+        if not snapshot:
             _LOGGER.debug(f"No data provided for sensor {self._name}")
             return
             
         try:
-            # _LOGGER.debug(f"更新实体: {self._name}, hass={self.hass}")
-            # 解析嵌套数据示例
-            # _LOGGER.warning(new_data)
-            
-            # Special handling for battery data that's in storageList
-            if self._key in ['batSoc', 'batChargePower', 'batDischargePower', 'pvChargePower', 'acChargePower', 'devicePower']:
-                # Look in storageList first for battery-specific data
-                storage_list = new_data.get('storageList', [])
-                if storage_list and len(storage_list) > 0:
-                    storage_device = storage_list[0]  # First (main) storage device
-                    v = storage_device.get(self._key)
-                    if v is None:
-                        # Fallback to top-level data if not found in storage
-                        v = new_data.get(self._key)
-                else:
-                    # No storage list, use top-level data
-                    v = new_data.get(self._key)
+            flow = snapshot.flow
+            if self._key in STORAGE_KEYS:
+                # 电池字段优先取 storageList[0]，缺失时回退到顶层数据
+                v = snapshot.storage_value(self._key)
             else:
-                # Normal top-level data lookup for other sensors
-                v = new_data.get(self._key)
-            
-            # Store original value for debugging
-            original_value = v
+                v = flow.get(self._key)
 
             if self._key == "aiSystemStatus":
-                # _LOGGER.info(f"获取到AI模式数据: {ai}")
+                ai = snapshot.ai
                 if ai and ai['antiRefluxSet'] == 1:
                     if ai['powerTimeSetVos']:
                         match ai['powerTimeSetVos'][0]['mode']:
@@ -217,63 +264,29 @@ class AeccSensor(SensorEntity):
                     self._state = "disable"
                 self._unit = ""
             elif self._key == "plant_name":
-                # _LOGGER.info(f"获取到AI模式数据: {ai}")
                 self._state =self.hass.data[DOMAIN]['cur_plant_name']
                 self._unit = ""
             else:
                 if v:
                     _LOGGER.debug(f"未解析:{self._key}：{v}")
-                    yz = split_value_unit(v)
-                    _LOGGER.debug(f"解析后：{self._key},{yz}")
-
-                    # 分离处理单位和数值
-                    if yz[0] is not None:
-                        # Ensure numeric state for numeric sensors
-                        try:
-                            self._state = float(yz[0]) if isinstance(yz[0], (int, float, str)) and str(yz[0]).replace('.', '').replace('-', '').isdigit() else yz[0]
-                        except (ValueError, TypeError):
-                            self._state = yz[0]
-                    
-                    # Only update unit if it wasn't provided during initialization
-                    if not self._unit and yz[1]:
-                        self._unit = yz[1]
+                    self._apply_value(v)
                     # 替换 总负载功率=负载功率+家庭功率+充电桩功率
                     if self._key == "totalLoadPower":
-                        self._state = split_value_unit(new_data.get("homePower"))[0] + \
-                                      split_value_unit(new_data.get("loadPower"))[0] + \
-                                      split_value_unit(new_data.get("chargerTotalPower"))[0]
+                        self._state = parse_value(flow.get("homePower")).value + \
+                                      parse_value(flow.get("loadPower")).value + \
+                                      parse_value(flow.get("chargerTotalPower")).value
                         self._unit = "W"
                     if self._key == "batPower":
-                        self._state = -(split_value_unit(new_data.get("batPower"))[0] *new_data.get("batWorkMode"))
+                        self._state = -(parse_value(flow.get("batPower")).value *flow.get("batWorkMode"))
                         self._unit = "W"
-                elif v is None:
-                    for k, mp in device_info.items():
-                        _LOGGER.debug(f"设备信息sn&key：{self._key},{k}")
-                        if self._key.startswith(k):
-                            _LOGGER.debug(f"设备信息更新：{self.field_name},{v}")
-                            if self.field_name is None:
-                                v = mp.get(self._name)
-                            else:
-                                v = mp.get(self.field_name)
-
-                            if v:
-                                yz = split_value_unit(v)
-                                _LOGGER.debug(f"解析后：{self._key},{yz}")
-                                # 分离处理单位和数值
-                                if yz[0] is not None:
-                                    # Ensure numeric state for numeric sensors
-                                    try:
-                                        self._state = float(yz[0]) if isinstance(yz[0], (int, float, str)) and str(yz[0]).replace('.', '').replace('-', '').isdigit() else yz[0]
-                                    except (ValueError, TypeError):
-                                        self._state = yz[0]
-                                
-                                    # Only update unit if it wasn't provided during initialization
-                                    if not self._unit and yz[1]:
-                                        self._unit = yz[1]
-                            elif self._key.endswith("as"):
-                                self._state = self.device.device_name
-                            break
-                else:
+                elif v is None and snapshot.has_display(self.device.device_sn):
+                    # displayMap 按设备SN索引，直接取本实体字段
+                    v = snapshot.display_value(self.device.device_sn, self.field_name or self._name)
+                    if v:
+                        self._apply_value(v)
+                    elif self._key.endswith("as"):
+                        self._state = self.device.device_name
+                elif v is not None:
                     self._state = 0
                 
         except Exception as e:
@@ -284,41 +297,93 @@ class AeccSensor(SensorEntity):
         if not hasattr(self, "hass") or self.hass is None:
             _LOGGER.debug("实体未完成初始化，跳过状态更新")
             return
-            
-        try:
-            self.async_write_ha_state()
-        except Exception as e:
-            _LOGGER.error(f"Error writing state for sensor {self._name}: {e}")
-
-        # _LOGGER.info(self.device)
-        if self.device:
-            attrs ={
-                "deviceSn": self.device.device_sn,
-                "iconType": self.device.icon_type,
-                "dtc": self.device.device_code_type,
-                "plantId": self.hub.senceId,
-            }
-        else:
-            attrs = {
-                "plantId": self.hub.senceId,
-            }
 
+        attrs = self.device.identity_attributes(self.hub.senceId)
         if self._key == "plant_name":
             self._attributes = {
                 "cur_plant": self.hub.senceId,
                 "cur_ctl_device_sn": self.hub.cur_ctl_devices,
-                "last_updated": datetime.now().isoformat(),
-                "data": self.hub.total_data,
-                "devices": self.hub.device_data,
-                "plants": self.hub.plants,
+                **self.hub.payload_summary(),
                 "attrs": attrs,
             }
+        elif self._attributes.get("attrs") is not attrs:
+            # 身份属性不变时复用同一个属性字典
+            self._attributes = {"attrs": attrs}
+
+        # 仅在数值显著变化或有意义的属性变化时写入
+        if not self._write_policy.should_write(self._state, self._attributes):
+            self._defer_write()
+            return
+        try:
+            self.async_write_ha_state()
+            self._write_policy.written(self._state, self._attributes)
+        except Exception as e:
+            _LOGGER.error(f"Error writing state for sensor {self._name}: {e}")
+
+
+
+class AeccHubStatsSensor(SensorEntity):
+    """Diagnostic sensor reporting one of the hub's runtime counters."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_should_poll = False
+    # 运行计数全部是易变属性
+    _unrecorded_attributes = frozenset({MATCH_ALL})
+
+    def __init__(self, hub: MyIntegrationHub, device, name, stats_attr, value_key):
+        super().__init__()
+        self.device = device
+        self.hub = hub
+        self.pf = "sensor"
+        self._stats_attr = stats_attr
+        self._value_key = value_key
+        device_sn = re.sub(r"[^a-z0-9]", "", device.device_sn.lower())
+        self._attr_name = name
+        self._attr_unique_id = f"aecc_cloud_{device_sn}_{name.replace('_', ' ').lower()}"
+        # 诊断计数每轮都更新；熔断状态另由hub在变化时即时推送
+        if stats_attr == "breaker_stats":
+            self.data_sources = frozenset({SOURCE_HUB, SOURCE_BREAKERS})
+            min_interval = 0
         else:
-            self._attributes = {
-                "last_updated": datetime.now().isoformat(),
-                "attrs": attrs,
-            }
+            self.data_sources = frozenset({SOURCE_HUB})
+            # 计数每轮都会变化，限制写入频率
+            min_interval = DIAGNOSTIC_MIN_WRITE_INTERVAL
+        self._write_policy = StateWritePolicy(min_interval=min_interval, compare_attributes=False)
+
+    async def async_added_to_hass(self):
+        self._write_policy.reset()
+        self.hub.subscribe(self)
+
+    async def async_will_remove_from_hass(self):
+        self.hub.unsubscribe(self)
+
+    @property
+    def _stats(self):
+        return getattr(self.hub, self._stats_attr)
+
+    @property
+    def native_value(self):
+        return self._stats.get(self._value_key)
+
+    @property
+    def extra_state_attributes(self):
+        return dict(self._stats)
 
+    @property
+    def device_info(self):
+        return {
+            "identifiers": {(DOMAIN, self.device.device_sn)},
+            "name": self.device.device_sn,
+            "model": self.device.icon_type,
+            "manufacturer": "AECC",
+        }
+
+    def update_data(self, snapshot):
+        if not hasattr(self, "hass") or self.hass is None:
+            return
+        if self._write_policy.should_write(self.native_value):
+            self.async_write_ha_state()
+            self._write_policy.written(self.native_value)
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
@@ -0,0 +1,85 @@
+"""Normalized per-cycle view of the cloud data shared by all entities."""
+
+from __future__ import annotations
+
+from typing import Any
+
+# 带开关状态的设备列表
+SWITCH_LISTS = ("loadList", "chargerList", "heatPumpList")
+
+
+class Snapshot:
+    """SN-indexed snapshot built once per refresh cycle.
+
+    The raw getHomeCountData response is flattened so entities can read
+    their value with a single dict lookup instead of scanning lists:
+
+    * ``flow``: scalar top-level fields of the energy-flow response
+    * ``storage``: fields of the main storage device (storageList[0])
+    * ``switches``: device SN -> switchStatus across load/charger/heat pump lists
+    * ``status``: device SN -> online status from the same lists (0 = offline)
+    * ``display``: device SN -> displayMap from getDeviceBySn
+    """
+
+    __slots__ = ("raw", "flow", "storage", "switches", "status", "display", "ai")
+
+    def __init__(self, total_data=None, devices_info=None, ai_config=None):
+        self.raw = total_data or {}
+        self.flow: dict[str, Any] = {}
+        self.storage: dict[str, Any] = {}
+        self.switches: dict[str, Any] = {}
+        self.status: dict[str, Any] = {}
+        self.display: dict[str, dict] = devices_info or {}
+        self.ai = ai_config
+
+        for key, value in self.raw.items():
+            if not isinstance(value, (list, dict)):
+                self.flow[key] = value
+        storage_list = self.raw.get("storageList") or []
+        if storage_list:
+            self.storage = storage_list[0]
+        for list_key in SWITCH_LISTS:
+            for item in self.raw.get(list_key) or []:
+                sn = item.get("deviceSn")
+                # 同一SN只取第一次出现的状态，与原先的线性查找一致
+                if sn is not None and sn not in self.switches:
+                    self.switches[sn] = item.get("switchStatus")
+                    self.status[sn] = item.get("status")
+
+    def __bool__(self):
+        return bool(self.raw)
+
+    def storage_value(self, key):
+        """Battery field from the main storage device, falling back to the flow data."""
+        value = self.storage.get(key)
+        if value is None:
+            value = self.flow.get(key)
+        return value
+
+    def display_value(self, sn, field):
+        return self.display.get(sn, {}).get(field)
+
+    def has_display(self, sn):
+        return sn in self.display
+
+    def switch_status(self, sn):
+        return self.switches.get(sn)
+
+    def is_offline(self, sn):
+        """Only devices listed with status 0 count as offline; unlisted devices are assumed online."""
+        return self.status.get(sn) == 0
+
+    def source_values(self) -> dict[tuple, Any]:
+        """把快照展开为 数据源键 -> 取值，用于按数据源分发更新"""
+        values: dict[tuple, Any] = {}
+        for key, value in self.flow.items():
+            values[("flow", key)] = value
+        for key, value in self.storage.items():
+            values[("storage", key)] = value
+        for sn, status in self.switches.items():
+            values[("switch", sn)] = status
+        for sn, display_map in self.display.items():
+            for field, value in display_map.items():
+                values[("display", sn, field)] = value
+        values[("ai",)] = self.ai
+        return values
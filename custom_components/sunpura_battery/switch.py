@@ -1,16 +1,16 @@
 import logging
-from datetime import datetime
 
 from homeassistant.components.switch import SwitchEntity, SwitchDeviceClass
 from homeassistant.const import (
     STATE_OFF,
     STATE_ON,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 
-from .entity import BaseEntity
+from .entity import BaseEntity, StateWritePolicy
 from .const import DOMAIN
 import re
 _LOGGER = logging.getLogger(__name__)
@@ -20,6 +20,9 @@ _LOGGER = logging.getLogger(__name__)
 class AeccSwitch(SwitchEntity):
     """Representation of a switch."""
 
+    # 状态由hub推送，不需要HA定时轮询
+    _attr_should_poll = False
+
     def __init__(self,hass, hub,device, name, key):
         """Initialize the switch."""
         super().__init__()
@@ -36,9 +39,33 @@ class AeccSwitch(SwitchEntity):
         self._unique_id = self._generate_unique_id()
         self._unit = ""
         self._attributes = {}
+        self._write_policy = StateWritePolicy(min_interval=hub.min_state_write_interval)
+        self._unsub_deferred_write = None
+        self.data_sources = frozenset({("switch", device.device_sn), ("flow", key)})
         _LOGGER.info(f"创建开关实体: {self._name}, hass={self.device.device_sn}")
-        # 注册到hub
-        hub.add_entity(self)
+
+    async def async_added_to_hass(self):
+        # 注册到hub，按数据源接收更新
+        self._write_policy.reset()
+        self.hub.subscribe(self)
+
+    async def async_will_remove_from_hass(self):
+        self.hub.unsubscribe(self)
+        if self._unsub_deferred_write is not None:
+            self._unsub_deferred_write()
+            self._unsub_deferred_write = None
+
+    def _defer_write(self):
+        """状态变化只因最小写入间隔被挡下时，到期后按最新快照补写"""
+        delay = self._write_policy.held_back_for(self._state, self._attributes)
+        if delay is None or self._unsub_deferred_write is not None:
+            return
+        self._unsub_deferred_write = async_call_later(self.hass, delay, self._async_flush_deferred_write)
+
+    @callback
+    def _async_flush_deferred_write(self, _now):
+        self._unsub_deferred_write = None
+        self.update_data(self.hub.snapshot)
 
 
 
@@ -67,37 +94,13 @@ class AeccSwitch(SwitchEntity):
 
     def disable_entity(self):
         self._available = False
-    def update_data(self, new_data,d,ai):
+    def update_data(self, snapshot):
         # _LOGGER.info(f"switch更新: {self._name}")
         _LOGGER.debug(f"switch更新时按钮状态: {self._name},{self.state},{self.is_on}")
-        # 解析嵌套数据示例
-        # _LOGGER.warning(new_data)
-        # v = new_data.get(self._key)
-        v = new_data.get(self._key)
-        if 'loadList' in new_data and new_data['loadList']:
-            for load in new_data['loadList']:
-                if not v is not None:
-                    sn = load.get('deviceSn')
-                    if sn == self.device.device_sn:
-                        v  = load.get('switchStatus')
-                        break
-
-        if  v is None:
-            if 'chargerList' in new_data and new_data['chargerList']:
-                for charger in new_data['chargerList']:
-                    if v is None:
-                        sn = charger.get('deviceSn')
-                        if sn == self.device.device_sn:
-                            v = charger.get('switchStatus')
-                            break
-        if  v is None:
-            if 'heatPumpList' in new_data and new_data['heatPumpList']:
-                for heat in new_data['heatPumpList']:
-                    if v is None:
-                        sn = heat.get('deviceSn')
-                        if sn == self.device.device_sn:
-                            v = heat.get('switchStatus')
-                            break
+        # 先取顶层字段，再按SN查负载/充电桩/热泵的开关状态
+        v = snapshot.flow.get(self._key)
+        if v is None:
+            v = snapshot.switch_status(self.device.device_sn)
         # u = new_data.get(self._unit)
         # _LOGGER.warning(f"{self._key},{v}")
         if v is not None:
@@ -111,25 +114,16 @@ class AeccSwitch(SwitchEntity):
         if not hasattr(self, "hass") or self.hass is None:
             _LOGGER.debug("实体未完成初始化，跳过状态更新")
             return
-        # _LOGGER.info(self.device)
-        if self.device:
-            attrs ={
-                "deviceSn": self.device.device_sn,
-                "iconType": self.device.icon_type,
-                "dtc": self.device.device_code_type,
-                "plantId": self.hub.senceId,
-            }
+        attrs = self.device.identity_attributes(self.hub.senceId)
+        if self._attributes.get("attrs") is not attrs:
+            # 身份属性不变时复用同一个属性字典
+            self._attributes = {"attrs": attrs}
+        # 仅在开关状态或有意义的属性变化时写入
+        if self._write_policy.should_write(self._state, self._attributes):
+            self.async_write_ha_state()
+            self._write_policy.written(self._state, self._attributes)
         else:
-            attrs = {
-                "plantId": self.hub.senceId,
-            }
-
-
-        self._attributes = {
-            "last_updated": datetime.now().isoformat(),
-            "attrs": attrs,
-        }
-        # pass
+            self._defer_write()
 
     async def async_turn_on(self, **kwargs):
         """Turn the switch on."""
@@ -137,15 +131,13 @@ class AeccSwitch(SwitchEntity):
 
         _LOGGER.info(f"按钮开启")
         _LOGGER.info(f"{self.device.icon_type}")
-        if self.device.icon_type == 5:
-            await self.hub.switch_socket(self.device.device_sn, 1)
-        elif self.device.icon_type == 6:
-            await self.hub.switch_charger(self.device.device_sn, 1)
-        else:
-            await self.hub.switch_product(self.device.device_sn, 1)
+        await self.hub.async_switch_device(self.device.device_sn, self.device.icon_type, 1)
         self._state = STATE_ON
-        self.hub.async_update_data()
         self.async_write_ha_state()
+        # 乐观状态也记入写入策略，确认失败时才能按实际状态回写
+        self._write_policy.written(self._state, self._attributes)
+        # 只轮询开关状态列表确认生效，不触发整轮刷新
+        self.hub.expect_switch_state(self.device.device_sn, 1)
 
     async def async_turn_off(self, **kwargs):
         """Turn the switch off."""
@@ -153,15 +145,13 @@ class AeccSwitch(SwitchEntity):
         _LOGGER.info(f"{self.device.icon_type}")
         _LOGGER.info(f"按钮关闭")
 
-        if self.device.icon_type == 5:
-            await self.hub.switch_socket(self.device.device_sn, 0)
-        elif self.device.icon_type == 6:
-            await self.hub.switch_charger(self.device.device_sn, 0)
-        else:
-            await self.hub.switch_product(self.device.device_sn, 0)
+        await self.hub.async_switch_device(self.device.device_sn, self.device.icon_type, 0)
         self._state = STATE_OFF
-        self.hub.async_update_data()
         self.async_write_ha_state()
+        # 乐观状态也记入写入策略，确认失败时才能按实际状态回写
+        self._write_policy.written(self._state, self._attributes)
+        # 只轮询开关状态列表确认生效，不触发整轮刷新
+        self.hub.expect_switch_state(self.device.device_sn, 0)
 
 
 
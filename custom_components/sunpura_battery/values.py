@@ -0,0 +1,69 @@
+"""Decoding of cloud "value+unit" strings into numbers with canonical units."""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any, NamedTuple
+
+from .const import VALUE_PARSE_CACHE_SIZE
+
+# 数值部分（整数/小数）和可选的单位部分（非数字）
+_VALUE_RE = re.compile(r'^(-?\d+\.?\d*)(\D*)$')
+
+# 小写原始单位 -> (规范单位, 换算系数)
+CANONICAL_UNITS = {
+    "w": ("W", 1),
+    "kw": ("W", 1000),
+    "wh": ("kWh", 0.001),
+    "kwh": ("kWh", 1),
+    "v": ("V", 1),
+    "a": ("A", 1),
+    "%": ("%", 1),
+    "hz": ("Hz", 1),
+    "℃": ("°C", 1),
+    "°c": ("°C", 1),
+}
+
+
+class ParsedValue(NamedTuple):
+    """A decoded value; ``value`` is already scaled to ``unit``."""
+
+    value: Any
+    unit: str | None
+    scale: float
+
+
+@lru_cache(maxsize=64)
+def canonical_unit(unit: str | None) -> tuple[str | None, float]:
+    """Map a raw unit ("kW", "Wh", "℃") to its canonical unit and scale factor."""
+    if not unit:
+        return unit, 1
+    return CANONICAL_UNITS.get(unit.lower(), (unit, 1))
+
+
+def _parse(raw) -> ParsedValue:
+    match = _VALUE_RE.fullmatch(str(raw))
+    if not match:
+        return ParsedValue(raw, None, 1)
+    unit, scale = canonical_unit(match.group(2).strip())
+    value = float(match.group(1))
+    if scale != 1:
+        value = round(value * scale, 6)
+    return ParsedValue(value, unit, scale)
+
+
+_parse_cached = lru_cache(maxsize=VALUE_PARSE_CACHE_SIZE, typed=True)(_parse)
+
+
+def parse_value(raw) -> ParsedValue:
+    """
+    将类似 "239kwh"、"953w" 或纯数值（如 "123"）的原始值解析为规范单位下的数值。
+    每个不同的原始值只解析一次，结果缓存在有界LRU中。
+    无法解析的值原样返回，单位为None。
+    """
+    try:
+        return _parse_cached(raw)
+    except TypeError:
+        # 列表/字典等不可哈希的值不进缓存
+        return _parse(raw)
@@ -0,0 +1,103 @@
+"""Microbenchmark: decoding displayMap values per poll cycle.
+
+Compares the former ``split_value_unit`` + ``isdigit`` float check done
+on every cycle with the cached ``parse_value`` on the displayMap payloads
+in tests/fixtures/display_maps.json. Each cycle about 20% of the numeric
+values change, like a live plant. Run from the repository root with Home
+Assistant installed:
+
+    python scripts/bench_values.py
+"""
+
+import json
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "custom_components"))
+
+from sunpura_battery.values import _parse_cached, parse_value  # noqa: E402
+
+CYCLES = 50
+CHANGE_RATIO = 0.2
+REPEAT = 20
+
+
+def split_value_unit(s):
+    """The decoder used before the values module (sensor.py), kept verbatim."""
+    pattern = r'^(-?\d+\.?\d*)(\D*)$'
+    match = re.fullmatch(pattern, str(s))
+    if not match:
+        return s, None
+    value = float(match.group(1))
+    unit_part = match.group(2).strip()
+    unit = unit_part if unit_part else ''
+    return value, unit
+
+
+def old_decode(v):
+    yz = split_value_unit(v)
+    if yz[0] is not None:
+        try:
+            state = float(yz[0]) if isinstance(yz[0], (int, float, str)) and str(yz[0]).replace('.', '').replace('-', '').isdigit() else yz[0]
+        except (ValueError, TypeError):
+            state = yz[0]
+    return state, yz[1]
+
+
+def build_cycles(display_maps):
+    """Raw values per cycle; numeric values drift on a fraction of the fields."""
+    rng = random.Random(0)
+    fields = [(sn, key, raw) for sn, dm in display_maps.items() for key, raw in dm.items()]
+    current = {(sn, key): raw for sn, key, raw in fields}
+    cycles = []
+    for _ in range(CYCLES):
+        for sn, key, raw in fields:
+            match = re.fullmatch(r'(-?\d+\.?\d*)(\D*)', raw)
+            if match and rng.random() < CHANGE_RATIO:
+                value = float(match.group(1)) * rng.uniform(0.9, 1.1)
+                current[(sn, key)] = f"{value:.1f}{match.group(2)}"
+        cycles.append(list(current.values()))
+    return cycles
+
+
+def run_old(cycles):
+    for values in cycles:
+        for v in values:
+            old_decode(v)
+
+
+def run_new(cycles):
+    for values in cycles:
+        for v in values:
+            parse_value(v)
+
+
+def run_new_cold(cycles):
+    _parse_cached.cache_clear()
+    run_new(cycles)
+
+
+def main():
+    display_maps = json.loads((ROOT / "tests" / "fixtures" / "display_maps.json").read_text(encoding="utf-8"))
+    cycles = build_cycles(display_maps)
+    fields = len(cycles[0])
+
+    run_new(cycles)  # warm the cache
+    results = {
+        "old split_value_unit + isdigit": min(timeit.repeat(lambda: run_old(cycles), number=1, repeat=REPEAT)),
+        "new parse_value, cold cache": min(timeit.repeat(lambda: run_new_cold(cycles), number=1, repeat=REPEAT)),
+        "new parse_value, warm cache": min(timeit.repeat(lambda: run_new(cycles), number=1, repeat=REPEAT)),
+    }
+    print(f"{fields} displayMap fields, {CYCLES} cycles, ~{CHANGE_RATIO:.0%} of numeric values changing per cycle")
+    baseline = results["old split_value_unit + isdigit"]
+    for name, seconds in results.items():
+        per_cycle = seconds / CYCLES * 1e6
+        print(f"  {name:32s} {per_cycle:8.1f} us/cycle  ({baseline / seconds:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
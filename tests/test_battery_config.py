@@ -0,0 +1,187 @@
+"""Tests for the shared desired battery configuration and schedule compilation."""
+
+from datetime import datetime, time
+
+import pytest
+
+from sunpura_battery.battery_config import (
+    CONTROL_SLOTS,
+    DEFAULT_BATTERY_CONFIG,
+    EMPTY_CONTROL_TIME,
+    BatteryConfig,
+    ScheduleError,
+    SetpointLease,
+    compile_schedule,
+    config_matches,
+)
+
+
+def test_updates_from_several_entities_merge_into_one_payload():
+    config = BatteryConfig("SN1")
+    config.update(maxFeedPower=800)
+    config.update(powerMode=1, antiRefluxSet=1)
+    payload = config.payload("plant-1")
+    assert payload["sn"] == "SN1"
+    assert payload["plantId"] == "plant-1"
+    assert (payload["maxFeedPower"], payload["powerMode"], payload["antiRefluxSet"]) == (800, 1, 1)
+    # 未修改的字段保持默认值
+    assert payload["maxChargePower"] == DEFAULT_BATTERY_CONFIG["maxChargePower"]
+
+
+def test_observed_config_seeds_desired_state_unless_a_change_is_pending():
+    config = BatteryConfig("SN1")
+    config.observe({"maxFeedPower": 1200, "unknownField": 1})
+    assert config.desired["maxFeedPower"] == 1200
+    assert "unknownField" not in config.desired
+
+    config.update(maxFeedPower=500)
+    config.observe({"maxFeedPower": 1200})
+    assert config.desired["maxFeedPower"] == 500
+
+
+def test_settled_only_clears_pending_for_the_latest_version():
+    config = BatteryConfig("SN1")
+    config.update(maxFeedPower=500)
+    uploaded = config.version
+    config.update(maxFeedPower=600)
+    config.settled(uploaded)
+    assert config.pending
+    config.settled(config.version)
+    assert not config.pending
+
+
+def test_default_config_is_not_shared_between_devices():
+    first, second = BatteryConfig("SN1"), BatteryConfig("SN2")
+    first.desired["powerTimeSetVos"].append({"mode": 6})
+    assert second.desired["powerTimeSetVos"] == []
+
+
+def cloud_config(**fields):
+    """A config as getAiSystemByPlantId reports it: strings, unpadded times, omitted defaults."""
+    config = {"maxFeedPower": "2400", "energyMode": "0", "controlTime1": "0,0:00,0:00,0,0,0,0,0,0,100,10"}
+    config.update(fields)
+    return config
+
+
+def test_matching_config_ignores_representation_differences():
+    config = BatteryConfig("SN1")
+    assert config.matches(cloud_config())
+
+
+def test_any_differing_field_is_a_real_change():
+    config = BatteryConfig("SN1")
+    config.update(maxFeedPower=800)
+    assert not config.matches(cloud_config())
+
+
+def test_disabled_time_slots_compare_equal_whatever_their_content():
+    config = BatteryConfig("SN1")
+    assert config.matches(cloud_config(controlTime2="0,08:00,09:00,500,0,6,0,0,0,100,10"))
+
+
+def test_power_time_entries_compare_without_order():
+    first = {"timeSwitch": 1, "startTime": "8:00", "endTime": "09:00", "forcedPower": "500"}
+    second = {"timeSwitch": 1, "startTime": "10:00", "endTime": "11:00", "forcedPower": -300}
+    config = BatteryConfig("SN1")
+    config.update(powerTimeSetVos=[first, second])
+    assert config.matches(cloud_config(powerTimeSetVos=[second, {**first, "startTime": "08:00", "forcedPower": 500}]))
+
+
+def test_no_observed_config_never_matches():
+    assert not BatteryConfig("SN1").matches(None)
+    assert not BatteryConfig("SN1").matches({})
+
+
+def slots_of(fields):
+    return [fields[f"controlTime{i}"] for i in range(1, CONTROL_SLOTS + 1) if fields[f"controlTime{i}"] != EMPTY_CONTROL_TIME]
+
+
+def test_schedule_compiles_to_control_times_and_entries():
+    fields = compile_schedule([
+        {"start": time(17, 0), "end": time(22, 0), "power": -800, "discharging_soc": 20},
+        {"start": "00:00", "end": "06:00", "power": 1500},
+    ])
+    assert fields["timeMode"] == 1
+    assert slots_of(fields) == [
+        "1,00:00,06:00,1500,0,6,0,0,0,100,10",
+        "1,17:00,22:00,-800,0,6,0,0,0,100,20",
+    ]
+    assert [vo["startTime"] for vo in fields["powerTimeSetVos"]] == ["00:00", "17:00"]
+
+
+def test_back_to_back_ranges_with_same_settings_are_merged():
+    fields = compile_schedule([
+        {"start": "01:00", "end": "02:00", "power": 1000},
+        {"start": "02:00", "end": "03:00", "power": 1000},
+        {"start": "03:00", "end": "04:00", "power": 500},
+    ])
+    assert slots_of(fields) == [
+        "1,01:00,03:00,1000,0,6,0,0,0,100,10",
+        "1,03:00,04:00,500,0,6,0,0,0,100,10",
+    ]
+
+
+def test_range_over_midnight_is_allowed():
+    fields = compile_schedule([{"start": "22:00", "end": "02:00", "power": 1000}])
+    assert slots_of(fields) == ["1,22:00,02:00,1000,0,6,0,0,0,100,10"]
+
+
+@pytest.mark.parametrize(
+    "ranges",
+    [
+        [{"start": "01:00", "end": "03:00", "power": 1}, {"start": "02:00", "end": "04:00", "power": 2}],
+        # 跨零点的时段与凌晨时段重叠
+        [{"start": "23:00", "end": "02:00", "power": 1}, {"start": "01:00", "end": "03:00", "power": 2}],
+        [{"start": "05:00", "end": "05:00", "power": 1}],
+    ],
+)
+def test_overlapping_or_empty_ranges_are_rejected(ranges):
+    with pytest.raises(ScheduleError):
+        compile_schedule(ranges)
+
+
+def test_plan_is_limited_to_the_battery_slots():
+    def hourly(count):
+        # 功率交替，避免相邻时段被合并
+        return [{"start": f"{h:02d}:00", "end": f"{h:02d}:30", "power": 100 + h % 2} for h in range(count)]
+
+    assert len(slots_of(compile_schedule(hourly(CONTROL_SLOTS)))) == CONTROL_SLOTS
+    with pytest.raises(ScheduleError):
+        compile_schedule(hourly(CONTROL_SLOTS + 1))
+
+
+def test_empty_plan_clears_the_schedule():
+    fields = compile_schedule([])
+    assert fields["timeMode"] == 0
+    assert fields["powerTimeSetVos"] == []
+    assert slots_of(fields) == []
+
+
+def test_lease_writes_its_window_as_the_first_slot():
+    lease = SetpointLease(-1500, datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 11, 0))
+    fields = lease.fields()
+    assert (fields["timeMode"], fields["forcedPower"]) == (1, -1500)
+    assert fields["controlTime1"] == "1,10:00,11:00,-1500,0,6,0,0,0,100,10"
+    assert slots_of(fields) == [fields["controlTime1"]]
+
+
+def test_lease_is_held_only_while_its_slot_is_active():
+    lease = SetpointLease(-1500, datetime(2026, 1, 1, 10, 0), datetime(2026, 1, 1, 11, 0))
+    held = cloud_config(timeMode="1", controlTime1="1,10:00,11:00,-1500,0,6,0,0,0,100,10")
+    assert lease.held_by(held)
+    # 切换到智能/零馈网模式后时段关闭
+    assert not lease.held_by({**held, "timeMode": 0})
+    assert not lease.held_by({**held, "controlTime1": "1,10:00,11:00,800,0,6,0,0,0,100,10"})
+    assert not lease.held_by(None)
+
+
+def test_confirmation_compares_the_uploaded_payload_with_the_observed_config():
+    config = BatteryConfig("SN1")
+    config.update(maxFeedPower=800)
+    payload = config.payload("plant-1")
+    # 载荷中的 id/sn/plantId 不参与比较
+    assert config_matches(payload, cloud_config(maxFeedPower="800"))
+    assert not config_matches(payload, cloud_config())
+    # 上传后本地又有修改：确认仍以上传时的载荷为准
+    config.update(maxFeedPower=900)
+    assert config_matches(payload, cloud_config(maxFeedPower=800))
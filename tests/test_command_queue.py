@@ -0,0 +1,121 @@
+"""Tests for the per-device command queue."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from sunpura_battery.command_queue import SKIPPED, CommandQueue
+
+
+def make_queue(debounce=0.01):
+    loop = asyncio.get_running_loop()
+    hass = SimpleNamespace(loop=loop, async_create_task=loop.create_task)
+    return CommandQueue(hass, debounce)
+
+
+def recorder(log, name, delay=0):
+    async def send(value):
+        log.append(("start", name, value))
+        if delay:
+            await asyncio.sleep(delay)
+        log.append(("end", name, value))
+        return f"{name}={value}"
+    return send
+
+
+def test_values_within_debounce_window_collapse_to_latest():
+    async def run():
+        queue = make_queue()
+        log = []
+        send = recorder(log, "power")
+        results = await asyncio.gather(*(queue.submit("SN1", "power", v, send) for v in (100, 200, 300)))
+        return queue, log, results
+
+    queue, log, results = asyncio.run(run())
+    assert log == [("start", "power", 300), ("end", "power", 300)]
+    # 每个调用方都拿到携带其值的那次发送结果
+    assert results == ["power=300"] * 3
+    assert queue.stats == {"coalesced": 2, "sent": 1, "skipped": 0, "failed": 0}
+
+
+def test_different_parameters_are_sent_separately():
+    async def run():
+        queue = make_queue()
+        log = []
+        await asyncio.gather(
+            queue.submit("SN1", "power", 1, recorder(log, "power")),
+            queue.submit("SN1", "mode", 2, recorder(log, "mode")),
+        )
+        return queue, log
+
+    queue, log = asyncio.run(run())
+    assert [entry for entry in log if entry[0] == "end"] == [("end", "power", 1), ("end", "mode", 2)]
+    assert queue.stats["sent"] == 2
+
+
+def test_sends_for_one_device_never_overlap_and_keep_order():
+    async def run():
+        queue = make_queue(debounce=0)
+        log = []
+        send = recorder(log, "power", delay=0.02)
+        first = asyncio.ensure_future(queue.submit("SN1", "power", 1, send))
+        await asyncio.sleep(0.005)
+        # 第一次发送进行中：新值必须等它完成后才发送
+        second = asyncio.ensure_future(queue.submit("SN1", "power", 2, send))
+        await asyncio.gather(first, second)
+        return log
+
+    log = asyncio.run(run())
+    assert log == [
+        ("start", "power", 1), ("end", "power", 1),
+        ("start", "power", 2), ("end", "power", 2),
+    ]
+
+
+def test_devices_are_independent():
+    async def run():
+        queue = make_queue(debounce=0)
+        log = []
+        await asyncio.gather(
+            queue.submit("SN1", "power", 1, recorder(log, "a", delay=0.02)),
+            queue.submit("SN2", "power", 2, recorder(log, "b", delay=0.02)),
+        )
+        return log
+
+    log = asyncio.run(run())
+    # 两台设备的发送交错进行
+    assert [entry[0] for entry in log] == ["start", "start", "end", "end"]
+
+
+def test_skipped_and_failed_sends_are_counted():
+    async def run():
+        queue = make_queue(debounce=0)
+
+        async def skip(value):
+            return SKIPPED
+
+        async def fail(value):
+            raise RuntimeError("cloud error")
+
+        assert await queue.submit("SN1", "a", 1, skip) is SKIPPED
+        with pytest.raises(RuntimeError):
+            await queue.submit("SN1", "b", 1, fail)
+        return queue
+
+    queue = asyncio.run(run())
+    assert queue.stats == {"coalesced": 0, "sent": 0, "skipped": 1, "failed": 1}
+
+
+def test_cancel_drops_queued_commands():
+    async def run():
+        queue = make_queue(debounce=10)
+        log = []
+        pending = asyncio.ensure_future(queue.submit("SN1", "power", 1, recorder(log, "power")))
+        await asyncio.sleep(0)
+        queue.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        return log
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,53 @@
+"""Tests for the diagnostics dump."""
+
+import asyncio
+from types import SimpleNamespace
+
+from sunpura_battery.const import DOMAIN
+from sunpura_battery.diagnostics import async_get_config_entry_diagnostics
+
+REDACTED = "**REDACTED**"
+
+
+class FakeHub:
+    refresh_stats = {"cycles": 3}
+    connection_stats = {}
+    confirm_stats = {}
+    rate_limit_stats = {}
+    breaker_stats = {}
+
+    def payload_summary(self):
+        return {"device_count": 1}
+
+    def plant_payload(self):
+        return {
+            "cur_plant": "1234",
+            "cur_ctl_device_sn": "EMS0001",
+            "data": {"deviceSn": "EMS0001", "batSoc": 67, "loadList": [{"deviceSn": "SOCKET01", "switchStatus": 1}]},
+            "devices": {"BS2300018842": {"deviceSn": "BS2300018842", "displayMap": {"Battery SOC": "67%", "datalog sn": "SXDI78C594"}}},
+            "plants": [{"id": 1234, "plantName": "Home", "address": "Main street 1", "latitude": 50.8, "longitude": 4.3}],
+            "ai_config": {"plantId": 1234, "maxFeedPower": 800},
+        }
+
+
+def test_identifying_fields_are_redacted():
+    hass = SimpleNamespace(data={DOMAIN: {"hub": FakeHub()}})
+    entry = SimpleNamespace(
+        data={"username": "me@example.com", "password": "secret", "selected_device_id": "1234", "selected_device_name": "Home"},
+        options={},
+    )
+    result = asyncio.run(async_get_config_entry_diagnostics(hass, entry))
+
+    assert set(result["entry"]["data"].values()) == {REDACTED}
+    payload = result["payload"]
+    assert payload["cur_plant"] == payload["cur_ctl_device_sn"] == REDACTED
+    assert payload["data"]["deviceSn"] == payload["data"]["loadList"][0]["deviceSn"] == REDACTED
+    assert payload["data"]["batSoc"] == 67
+    # 以序列号为键的设备详情改用序号
+    assert list(payload["devices"]) == ["device_1"]
+    display_map = payload["devices"]["device_1"]["displayMap"]
+    assert display_map == {"Battery SOC": "67%", "datalog sn": REDACTED}
+    plant = payload["plants"][0]
+    assert {plant[key] for key in ("id", "plantName", "address", "latitude", "longitude")} == {REDACTED}
+    assert payload["ai_config"] == {"plantId": REDACTED, "maxFeedPower": 800}
+    assert "1234" not in repr(result) and "EMS0001" not in repr(result)
@@ -0,0 +1,33 @@
+"""Tests for the entity state write policy."""
+
+from sunpura_battery.entity import StateWritePolicy
+
+
+def test_first_update_is_always_written(clock):
+    policy = StateWritePolicy(min_interval=60, clock=clock)
+    assert policy.should_write(1)
+
+
+def test_change_inside_interval_is_held_back_until_interval_ends(clock):
+    policy = StateWritePolicy(min_interval=60, clock=clock)
+    policy.written(1)
+    clock.now = 20
+    assert not policy.should_write(2)
+    assert policy.held_back_for(2) == 40
+    clock.now = 60
+    assert policy.should_write(2)
+    assert policy.held_back_for(2) is None
+
+
+def test_unchanged_value_is_not_held_back(clock):
+    policy = StateWritePolicy(min_interval=60, clock=clock)
+    policy.written(1)
+    clock.now = 20
+    assert policy.held_back_for(1) is None
+
+
+def test_insignificant_change_is_not_held_back(clock):
+    policy = StateWritePolicy("power", min_interval=60, clock=clock)
+    policy.written(1000.0)
+    clock.now = 20
+    assert policy.held_back_for(1000.5) is None
@@ -0,0 +1,108 @@
+"""Tests for the hub's switch confirmation polling and breaker notifications."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from sunpura_battery import hub as hub_module
+from sunpura_battery.const import SOURCE_BREAKERS
+from sunpura_battery.hub import MyIntegrationHub
+
+
+class FakeSwitch:
+    def __init__(self, sn):
+        self.data_sources = frozenset({("switch", sn)})
+        self.seen = []
+
+    def update_data(self, snapshot):
+        self.seen.append(snapshot.switch_status("SOCKET1"))
+
+
+def count_data(status):
+    return {"loadList": [{"deviceSn": "SOCKET1", "switchStatus": status, "status": 1}]}
+
+
+@pytest.fixture(autouse=True)
+def fast_confirmation(monkeypatch):
+    monkeypatch.setattr(hub_module, "CONFIRM_POLL_INTERVAL", 0)
+    monkeypatch.setattr(hub_module, "CONFIRM_TIMEOUT", 0)
+
+
+def run_with_hub(responses, test):
+    """Run ``test(hub)`` against a hub whose getHomeCountData returns ``responses`` in turn."""
+    async def main():
+        loop = asyncio.get_running_loop()
+        hass = SimpleNamespace(
+            loop=loop, async_create_task=loop.create_task, data={},
+            config=SimpleNamespace(language="en", config_dir="/nonexistent"),
+        )
+        hub = MyIntegrationHub(hass, "user", "password", "1234")
+        pending = list(responses)
+
+        async def get_home_count_data(sn=""):
+            data = pending.pop(0)
+            if data:
+                hub.total_data = data
+            return data
+
+        hub.getHomeCountData = get_home_count_data
+        try:
+            await test(hub)
+        finally:
+            await hub.async_close()
+
+    asyncio.run(main())
+
+
+def test_unconfirmed_switch_is_re_evaluated_although_its_status_did_not_change():
+    switch = FakeSwitch("SOCKET1")
+
+    async def test(hub):
+        hub.total_data = count_data(0)
+        hub._dispatch()
+        hub.subscribe(switch)
+        switch.seen.clear()
+        await hub.expect_switch_state("SOCKET1", 1)
+        assert hub.confirm_stats["timeouts"] == 1
+
+    run_with_hub([count_data(0)], test)
+    assert switch.seen == [0]
+
+
+def test_timed_out_switch_shows_the_observed_status_when_the_poll_failed():
+    switch = FakeSwitch("SOCKET1")
+
+    async def test(hub):
+        hub.total_data = count_data(0)
+        hub._dispatch()
+        hub.subscribe(switch)
+        switch.seen.clear()
+        await hub.expect_switch_state("SOCKET1", 1)
+
+    run_with_hub([None], test)
+    assert switch.seen == [0]
+
+
+class BreakerListener:
+    data_sources = frozenset({SOURCE_BREAKERS})
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.seen = []
+
+    def update_data(self, snapshot):
+        self.seen.append(self.hub.breaker_stats["open_circuits"])
+
+
+def test_breaker_state_changes_are_pushed_between_cycles():
+    async def test(hub):
+        listener = BreakerListener(hub)
+        hub.subscribe(listener)
+        breaker = hub._breaker(hub_module.BASE_URL + "/energy/getHomeCountData")
+        for _ in range(hub_module.CLOUD_CIRCUIT_FAILURE_THRESHOLD):
+            breaker.record_failure()
+        breaker.record_success()
+        assert listener.seen == [1, 0]
+
+    run_with_hub([], test)
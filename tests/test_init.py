@@ -0,0 +1,34 @@
+"""Tests for config entry removal."""
+
+import asyncio
+from types import SimpleNamespace
+
+import sunpura_battery
+
+
+def remove(entry, entries, monkeypatch):
+    removed = []
+
+    async def fake_remove(hass, username):
+        removed.append(username)
+
+    monkeypatch.setattr(sunpura_battery, "async_remove_session_cookies", fake_remove)
+    hass = SimpleNamespace(config_entries=SimpleNamespace(async_entries=lambda domain: entries))
+    asyncio.run(sunpura_battery.async_remove_entry(hass, entry))
+    return removed
+
+
+def new_entry(entry_id, username):
+    return SimpleNamespace(entry_id=entry_id, data={"username": username, "password": "secret"})
+
+
+def test_session_cookies_are_removed_with_the_last_entry_of_the_account(monkeypatch):
+    entry = new_entry("a", "me@example.com")
+    others = [new_entry("b", "someone@example.com")]
+    assert remove(entry, others, monkeypatch) == ["me@example.com"]
+
+
+def test_session_cookies_are_kept_while_the_account_has_other_entries(monkeypatch):
+    entry = new_entry("a", "me@example.com")
+    others = [new_entry("b", "me@example.com")]
+    assert remove(entry, others, monkeypatch) == []
@@ -0,0 +1,162 @@
+"""Tests for the cloud rate limiter, circuit breaker and retry backoff."""
+
+import asyncio
+
+import pytest
+
+from sunpura_battery import ratelimit
+from sunpura_battery.ratelimit import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    TokenBucket,
+    backoff_delay,
+)
+
+
+def new_stats():
+    return {"open_circuits": 0, "opened": 0, "rejected": 0, "circuits": {}}
+
+
+def failing_breaker(clock, stats=None, threshold=3):
+    breaker = CircuitBreaker("/energy/getHomeCountData", stats or new_stats(), threshold, 60, clock)
+    for _ in range(threshold):
+        breaker.check()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    stats = new_stats()
+    breaker = CircuitBreaker("/x", stats, 3, 60, clock)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    # 成功会清零连续失败计数
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert stats["open_circuits"] == 1 and stats["opened"] == 1
+    assert stats["circuits"] == {"/x": CIRCUIT_OPEN}
+
+
+def test_open_breaker_rejects_until_reset_timeout(clock):
+    stats = new_stats()
+    breaker = failing_breaker(clock, stats)
+    clock.now = 59
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert stats["rejected"] == 1
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    stats = new_stats()
+    breaker = failing_breaker(clock, stats)
+    clock.now = 60
+    breaker.check()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert stats["open_circuits"] == 0
+    breaker.check()
+
+
+def test_failed_probe_opens_the_breaker_again(clock):
+    breaker = failing_breaker(clock)
+    clock.now = 60
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    clock.now = 100
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_probe_without_result_is_replaced_after_another_timeout(clock):
+    breaker = failing_breaker(clock)
+    clock.now = 60
+    breaker.check()
+    clock.now = 120
+    breaker.check()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+
+
+def test_every_state_change_is_reported(clock):
+    changes = []
+    breaker = CircuitBreaker("/x", new_stats(), 1, 60, clock, on_change=lambda: changes.append(breaker.state))
+    breaker.record_failure()
+    clock.now = 60
+    breaker.check()
+    breaker.record_success()
+    # 连续成功不是状态变化
+    breaker.record_success()
+    assert changes == [CIRCUIT_OPEN, CIRCUIT_HALF_OPEN, CIRCUIT_CLOSED]
+
+
+def test_breakers_share_stats_per_hub(clock):
+    stats = new_stats()
+    failing_breaker(clock, stats)
+    CircuitBreaker("/aiSystem/getAiSystemByPlantId", stats, 3, 60, clock)
+    assert stats["open_circuits"] == 1
+    assert set(stats["circuits"]) == {"/energy/getHomeCountData", "/aiSystem/getAiSystemByPlantId"}
+
+
+def test_bucket_serves_burst_then_waits_for_refill(clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+        clock.now += delay
+
+    async def run():
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        for _ in range(5):
+            await bucket.acquire()
+        return bucket
+
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", fake_sleep)
+    bucket = asyncio.run(run())
+    # 3个令牌立即可用，之后每个令牌等待 1/rate 秒
+    assert slept == [0.5, 0.5]
+    assert bucket.stats == {"waiting": 0, "throttled": 2, "acquired": 5}
+
+
+def test_bucket_refills_up_to_burst_while_idle(clock):
+
+    async def run():
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        for _ in range(3):
+            await bucket.acquire()
+        clock.now = 100
+        for _ in range(3):
+            await bucket.acquire()
+        return bucket
+
+    bucket = asyncio.run(run())
+    assert bucket.stats["throttled"] == 0
+
+
+def test_bucket_counts_waiting_requests():
+    async def run():
+        bucket = TokenBucket(rate=50, burst=1)
+        await bucket.acquire()
+        waiters = [asyncio.ensure_future(bucket.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        waiting = bucket.stats["waiting"]
+        await asyncio.gather(*waiters)
+        return waiting, bucket.stats["waiting"]
+
+    assert asyncio.run(run()) == (3, 0)
+
+
+def test_backoff_grows_exponentially_with_jitter_and_is_capped(monkeypatch):
+    monkeypatch.setattr(ratelimit.random, "uniform", lambda low, high: high)
+    assert [backoff_delay(attempt, 0.5, 8) for attempt in range(6)] == [0.5, 1, 2, 4, 8, 8]
+    monkeypatch.setattr(ratelimit.random, "uniform", lambda low, high: low)
+    assert backoff_delay(3, 0.5, 8) == 0
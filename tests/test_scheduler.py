@@ -0,0 +1,133 @@
+"""Tests for tiered polling, adaptive flow polling and offline probe backoff."""
+
+from sunpura_battery.const import TIER_AI, TIER_DEVICES, TIER_FLOW, TIER_PLANTS
+from sunpura_battery.scheduler import AdaptiveInterval, PollScheduler, ProbeBackoff, tier_intervals_from_options
+
+
+INTERVALS = {TIER_FLOW: 10, TIER_DEVICES: 60, TIER_AI: 300, TIER_PLANTS: 3600}
+
+
+def run_all(scheduler):
+    for tier in scheduler.due_tiers():
+        scheduler.mark_run(tier)
+
+
+def test_every_tier_is_due_before_its_first_fetch(clock):
+    scheduler = PollScheduler(INTERVALS, clock)
+    assert scheduler.due_tiers() == set(INTERVALS)
+    assert scheduler.base_interval == 10
+
+
+def test_tiers_become_due_on_their_own_interval(clock):
+    scheduler = PollScheduler(INTERVALS, clock)
+    run_all(scheduler)
+    clock.now = 10
+    assert scheduler.due_tiers() == {TIER_FLOW}
+    run_all(scheduler)
+    clock.now = 60
+    assert scheduler.due_tiers() == {TIER_FLOW, TIER_DEVICES}
+
+
+def test_timer_jitter_does_not_postpone_a_tier_by_a_cycle(clock):
+    scheduler = PollScheduler(INTERVALS, clock)
+    run_all(scheduler)
+    # 定时器略早触发时，仍在半个基础间隔的余量内
+    clock.now = 59.2
+    assert TIER_DEVICES in scheduler.due_tiers()
+
+
+def test_invalidated_tier_is_fetched_on_the_next_cycle(clock):
+    scheduler = PollScheduler(INTERVALS, clock)
+    run_all(scheduler)
+    clock.now = 1
+    scheduler.invalidate(TIER_AI)
+    assert scheduler.due_tiers() == {TIER_AI}
+    scheduler.invalidate()
+    assert scheduler.due_tiers() == set(INTERVALS)
+
+
+def test_intervals_from_options_fall_back_to_defaults():
+    intervals = tier_intervals_from_options({"flow_interval": 20})
+    assert intervals[TIER_FLOW] == 20.0
+    assert intervals[TIER_PLANTS] == 3600.0
+
+
+def flow(pv=None, battery=None, load=None, soc=None):
+    """A getHomeCountData payload with the given signals; None leaves a field out."""
+    storage = {key: value for key, value in (("pvChargePower", pv), ("batSoc", soc)) if value is not None}
+    data = {"storageList": [storage]}
+    if battery is not None:
+        data["batPower"] = battery
+    if load is not None:
+        data["totalLoadPower"] = load
+    return data
+
+
+def test_volatile_power_polls_at_the_minimum_interval(clock):
+    adaptive = AdaptiveInterval(5, 60, 10, clock)
+    adaptive.observe(flow(pv="800W", battery=300, load=500, soc=50))
+    assert adaptive.observe(flow(pv="1200W", battery=300, load=500, soc=50)) == 5
+
+
+def test_flat_readings_back_off_gradually(clock):
+    adaptive = AdaptiveInterval(5, 60, 10, clock)
+    data = flow(pv=800, battery=300, load=500, soc=50)
+    intervals = [adaptive.observe(data) for _ in range(4)]
+    assert intervals == [7.5, 11.25, 16.875, 25.3125]
+
+
+def test_night_goes_straight_to_the_maximum(clock):
+    adaptive = AdaptiveInterval(5, 60, 10, clock)
+    assert adaptive.observe(flow(pv=0, battery=0, load=300, soc=40)) == 60
+
+
+def test_missing_signals_use_the_base_interval_instead_of_idle(clock):
+    adaptive = AdaptiveInterval(5, 60, 10, clock)
+    for _ in range(5):
+        assert adaptive.observe(flow(load=300)) == 10
+    assert adaptive.observe({"storageList": []}) == 10
+
+
+def test_command_boost_holds_the_minimum_interval(clock):
+    adaptive = AdaptiveInterval(5, 60, 10, clock)
+    adaptive.boost()
+    assert adaptive.observe(flow(pv=0, battery=0)) == 5
+    clock.now = 61
+    assert adaptive.observe(flow(pv=0, battery=0)) == 60
+
+
+def test_event_loop_lag_slows_polling_down(clock):
+    adaptive = AdaptiveInterval(5, 60, 10, clock)
+    assert adaptive.report_lag(0.1) == 5
+    assert adaptive.report_lag(2) == 10
+
+
+def test_offline_device_is_probed_on_a_doubling_backoff(clock):
+    backoff = ProbeBackoff(60, 3600, clock)
+    probes = []
+    for second in range(0, 1000):
+        clock.now = second
+        if backoff.due("SN1"):
+            probes.append(second)
+            backoff.probed("SN1")
+    assert probes == [0, 60, 180, 420, 900]
+
+
+def test_probe_interval_is_capped(clock):
+    backoff = ProbeBackoff(60, 200, clock)
+    for _ in range(5):
+        backoff.probed("SN1")
+    clock.now = 199
+    assert not backoff.due("SN1")
+    clock.now = 200
+    assert backoff.due("SN1")
+
+
+def test_device_back_online_drops_its_backoff(clock):
+    backoff = ProbeBackoff(60, 3600, clock)
+    backoff.probed("SN1")
+    backoff.probed("SN2")
+    assert not backoff.due("SN1")
+    backoff.reset("SN1")
+    assert backoff.due("SN1")
+    assert len(backoff) == 1
@@ -0,0 +1,55 @@
+"""Tests for the optimistic state of the device switches."""
+
+import asyncio
+from types import SimpleNamespace
+
+from sunpura_battery.snapshot import Snapshot
+from sunpura_battery.switch import AeccSwitch
+
+
+class FakeHub:
+    min_state_write_interval = 0
+    senceId = "plant"
+
+    def __init__(self):
+        self.commands = []
+        self.expected = []
+
+    async def async_switch_device(self, sn, icon_type, state):
+        self.commands.append((sn, state))
+
+    def expect_switch_state(self, sn, state):
+        self.expected.append((sn, state))
+
+
+def new_switch():
+    device = SimpleNamespace(
+        device_sn="SOCKET1", icon_type=4, identity_attributes=lambda plant: {"sn": "SOCKET1"}
+    )
+    switch = AeccSwitch(object(), FakeHub(), device, "switch", "socketSwitch")
+    writes = []
+    switch.async_write_ha_state = lambda: writes.append(switch.state)
+    return switch, writes
+
+
+def socket_snapshot(status):
+    return Snapshot({"loadList": [{"deviceSn": "SOCKET1", "switchStatus": status, "status": 1}]})
+
+
+def test_unapplied_command_is_reverted_to_the_observed_state():
+    switch, writes = new_switch()
+    switch.update_data(socket_snapshot(0))
+    asyncio.run(switch.async_turn_on())
+    assert switch.hub.expected == [("SOCKET1", 1)]
+    # 设备未执行命令：再次看到关闭状态时必须回写
+    switch.update_data(socket_snapshot(0))
+    assert writes == ["off", "on", "off"]
+    assert not switch.is_on
+
+
+def test_confirmed_command_is_not_written_twice():
+    switch, writes = new_switch()
+    switch.update_data(socket_snapshot(0))
+    asyncio.run(switch.async_turn_on())
+    switch.update_data(socket_snapshot(1))
+    assert writes == ["off", "on"]
@@ -0,0 +1,68 @@
+"""Tests for decoding cloud "value+unit" strings."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from sunpura_battery.values import ParsedValue, canonical_unit, parse_value
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.mark.parametrize(
+    ("unit", "expected"),
+    [
+        ("W", ("W", 1)),
+        ("kW", ("W", 1000)),
+        ("kw", ("W", 1000)),
+        ("Wh", ("kWh", 0.001)),
+        ("kWh", ("kWh", 1)),
+        ("℃", ("°C", 1)),
+        ("°C", ("°C", 1)),
+        ("Hz", ("Hz", 1)),
+        ("rpm", ("rpm", 1)),
+        ("", ("", 1)),
+        (None, (None, 1)),
+    ],
+)
+def test_canonical_unit(unit, expected):
+    assert canonical_unit(unit) == expected
+
+
+def test_kilowatts_are_scaled_to_watts():
+    assert parse_value("3.7kW") == ParsedValue(3700.0, "W", 1000)
+
+
+def test_watt_hours_are_scaled_to_kilowatt_hours():
+    assert parse_value("1250Wh") == ParsedValue(1.25, "kWh", 0.001)
+
+
+def test_degree_sign_becomes_celsius():
+    assert parse_value("31℃") == ParsedValue(31.0, "°C", 1)
+
+
+def test_negative_and_plain_numbers():
+    assert parse_value("-198W") == ParsedValue(-198.0, "W", 1)
+    assert parse_value("0.97") == ParsedValue(0.97, "", 1)
+    assert parse_value(42) == ParsedValue(42.0, "", 1)
+
+
+@pytest.mark.parametrize("raw", ["Charger Plug Connected", "V1.6.3", "SXDI78C594", ""])
+def test_non_numeric_strings_are_returned_unchanged(raw):
+    assert parse_value(raw) == ParsedValue(raw, None, 1)
+
+
+def test_unhashable_values_bypass_the_cache():
+    raw = ["1", "2"]
+    assert parse_value(raw) == ParsedValue(raw, None, 1)
+
+
+def test_repeated_values_are_decoded_once():
+    assert parse_value("232.1V") is parse_value("232.1V")
+
+
+def test_fixture_payload_decodes_to_canonical_units():
+    display_maps = json.loads((FIXTURES / "display_maps.json").read_text(encoding="utf-8"))
+    units = {parse_value(raw).unit for dm in display_maps.values() for raw in dm.values()}
+    assert units <= {"W", "kWh", "V", "A", "%", "Hz", "°C", "", None}